@@ -3,36 +3,87 @@
 #----------------------------------------------------------------------------#
 
 import json
+import base64
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, g, has_request_context, jsonify, abort, session
+from flask import before_render_template, template_rendered, stream_with_context
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import FlaskForm
 from forms import *
 from flask_migrate import Migrate
 import sys
-from sqlalchemy import func
+import time
+import random
+import click
+from datetime import datetime, timedelta
+from itertools import groupby
+from functools import lru_cache, wraps
+from contextlib import contextmanager
+from sqlalchemy import func, event, tuple_, insert, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import Pool
+from werkzeug.exceptions import HTTPException, InternalServerError
+from search import search_backend_for, Autocomplete
+from bulk import BadRecords, read_records, chunked, form_data
+from availability import Calendar, free_slots, day_range, calendar_days
+from geo import read_gazetteer, locate, covering_cells, prefix_end, distance_km
+from export import EXPORT_COLUMNS, EXPORT_MIMETYPES, export_lines
+from loader import GENRES, read_file, venue_row, artist_row, show_row, load_rows
+from cache import view_cache_from_config
+from instrumentation import EndpointMetrics, PoolMetrics, prometheus_text, pool_prometheus_text, SLOWEST_KEPT
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
+class RoutingSession(Session):
+  # Sends the statements of read-only requests to the replica picked for
+  # the request (g.db_replica); flushes always go to the primary.
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    replica = g.get('db_replica') if has_request_context() else None
+    if replica is not None and bind is None and not self._flushing:
+      return self._db.engines[replica]
+    return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS']=False
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 
 migrate = Migrate(app, db)
 
+@event.listens_for(Engine, 'begin')
+def set_statement_timeout(conn):
+  # Behind pgbouncer in transaction mode a connect-time setting would leak
+  # to other clients' transactions, so the timeout is set per transaction.
+  # Issued on the raw cursor so it stays out of the per-request query counts.
+  if app.config['DB_PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS'] and conn.dialect.name == 'postgresql':
+    cursor = conn.connection.cursor()
+    cursor.execute('SET LOCAL statement_timeout = {0:d}'.format(app.config['DB_STATEMENT_TIMEOUT_MS']))
+    cursor.close()
+
 # TODO: connect to a local postgresql database
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+# No show may run longer than MAX_SHOW_HOURS; the overlap checks rely on it
+# (see touching()). ck_shows_length enforces it on PostgreSQL and SQLite,
+# where PostgreSQL also has exclusion constraints against overlapping
+# bookings (migration 6d2f8b3e1a94).
+SHOW_LENGTH_CHECKS = {
+    'postgresql': "end_time - start_time <= interval '{0} hours'".format(app.config['MAX_SHOW_HOURS']),
+    'sqlite': 'round((julianday(end_time) - julianday(start_time)) * 86400) <= {0}'.format(app.config['MAX_SHOW_HOURS'] * 3600),
+}
+
 class Shows(db.Model):
     __tablename__ = 'shows'
     id = db.Column(db.Integer, primary_key=True)
@@ -40,10 +91,42 @@ class Shows(db.Model):
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
+    # Detail pages, searches, listings and booking overlap checks look up an
+    # artist's or venue's shows by time range; the start_time index serves
+    # queries over all shows by date.
+    __table_args__ = (
+        db.Index('ix_shows_artist_id_start_time_end_time', 'artist_id', 'start_time', 'end_time'),
+        db.Index('ix_shows_venue_id_start_time_end_time', 'venue_id', 'start_time', 'end_time'),
+        db.Index('ix_shows_start_time', 'start_time'),
+        *[db.CheckConstraint(check, name='ck_shows_length').ddl_if(dialect=dialect)
+          for dialect, check in SHOW_LENGTH_CHECKS.items()],
+    )
 
     def __repr__(self):
         return f'<Todo venue_id: {self.venue_id}, artist_id: {self.artist_id}, start_time: {self.start_time}>'
 
+# Genre links; the (genre_id, ...) indexes serve browsing by genre.
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+class Genres(db.Model):
+    # One row per forms.Genre value.
+    __tablename__ = 'genre'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Todo id: {self.id}, name: {self.name}>'
+
 class Venue(db.Model):
     __tablename__ = 'venue'
 
@@ -59,8 +142,19 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(120))
     website = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genres', secondary=venue_genres, order_by='Genres.name', lazy=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Position of the venue's city from the bundled gazetteer (see geo.py),
+    # and its geohash for /venues/nearby.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
     show_obj = db.relationship('Shows', cascade="all, delete", backref='venue_shows', lazy=True)
+    # /venues pages through venues in (city, state, id) order.
+    __table_args__ = (
+        db.Index('ix_venue_city_state_id', 'city', 'state', 'id'),
+        db.Index('ix_venue_geohash', 'geohash'),
+    )
 
     def __repr__(self):
         return f'<Todo id: {self.id}, name: {self.name}>'
@@ -75,12 +169,13 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genres', secondary=artist_genres, order_by='Genres.name', lazy=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(120), default=' ')
     website = db.Column(db.String(120))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     show_obj = db.relationship('Shows', cascade="all, delete", backref='artist_shows', lazy=True)
 
     def __repr__(self):
@@ -88,51 +183,562 @@ class Artist(db.Model):
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
+class UpcomingShows(db.Model):
+    # Summary table of the shows still to come, with their venue name and
+    # artist name and image copied in, so /shows/upcoming reads one table
+    # in start_time order. Kept current by the write handlers; see the
+    # upcoming show feed functions below.
+    __tablename__ = 'upcoming_shows'
+    show_id = db.Column(db.Integer, db.ForeignKey('shows.id', ondelete='CASCADE'), primary_key=True)
+    venue_id = db.Column(db.Integer, nullable=False)
+    venue_name = db.Column(db.String)
+    artist_id = db.Column(db.Integer, nullable=False)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.Index('ix_upcoming_shows_start_time_show_id', 'start_time', 'show_id'),
+        db.Index('ix_upcoming_shows_venue_id', 'venue_id'),
+        db.Index('ix_upcoming_shows_artist_id', 'artist_id'),
+    )
+
+    def __repr__(self):
+        return f'<Todo show_id: {self.show_id}, start_time: {self.start_time}>'
+
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+def genres_from_names(names):
+  # Genre rows for the submitted genre names; valid names missing from the
+  # lookup table (e.g. on a database built with create_all) are added.
+  genres = Genres.query.filter(Genres.name.in_(names)).all()
+  known = set(genre.name for genre in genres)
+  valid = set(genre.value for genre in Genre)
+  for name in names:
+    if name in valid and name not in known:
+      genre = Genres(name=name)
+      db.session.add(genre)
+      genres.append(genre)
+      known.add(name)
+  return genres
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+# Venue.upcoming_shows_count and Artist.upcoming_shows_count are kept in step
+# with the shows table by the write handlers, and rolled forward as shows
+# start by the `flask roll-upcoming-shows` command, so listings read a column
+# instead of counting shows.
+
+def recount_upcoming_shows(model, ids=None):
+  # Recomputes the counter from the shows table, for the given ids or all rows.
+  foreign_key = Shows.venue_id if model is Venue else Shows.artist_id
+  upcoming = db.session.query(func.count(Shows.id)).filter(
+    foreign_key == model.id, Shows.start_time > datetime.now()).correlate(model).scalar_subquery()
+  rows = model.query
+  if ids is not None:
+    if not ids:
+      return
+    rows = rows.filter(model.id.in_(ids))
+  rows.update({model.upcoming_shows_count: upcoming}, synchronize_session=False)
+
+def add_upcoming_show(venue_id, artist_id):
+  Venue.query.filter_by(id=venue_id).update({Venue.upcoming_shows_count: Venue.upcoming_shows_count + 1}, synchronize_session=False)
+  Artist.query.filter_by(id=artist_id).update({Artist.upcoming_shows_count: Artist.upcoming_shows_count + 1}, synchronize_session=False)
+
+# The upcoming_shows feed is refreshed the same way: rows are copied in as
+# shows are booked, dropped with their venue or artist, renamed with them,
+# and removed once the show starts by `flask roll-upcoming-shows`.
+
+FEED_COLUMNS = ['show_id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time', 'end_time']
+
+def feed_rows():
+  return db.select(Shows.id, Shows.venue_id, Venue.name, Shows.artist_id, Artist.name, Artist.image_link,
+                   Shows.start_time, Shows.end_time).join(Venue, Venue.id == Shows.venue_id).join(
+    Artist, Artist.id == Shows.artist_id).where(Shows.start_time > datetime.now())
+
+def add_to_upcoming_feed(show_ids):
+  # Copies the given shows into the feed, if they are still to come.
+  if not show_ids:
+    return
+  db.session.execute(insert(UpcomingShows).from_select(FEED_COLUMNS, feed_rows().where(Shows.id.in_(show_ids))))
+
+def rebuild_upcoming_feed():
+  db.session.execute(UpcomingShows.__table__.delete())
+  db.session.execute(insert(UpcomingShows).from_select(FEED_COLUMNS, feed_rows()))
+
+def rename_in_upcoming_feed(model, ids):
+  # Copies the current names, and artist images, of the given venues or artists into the feed.
+  if not ids:
+    return
+  db.session.flush()
+  if model is Venue:
+    key = UpcomingShows.venue_id
+    values = {UpcomingShows.venue_name: db.select(Venue.name).where(Venue.id == key).scalar_subquery()}
+  else:
+    key = UpcomingShows.artist_id
+    values = {UpcomingShows.artist_name: db.select(Artist.name).where(Artist.id == key).scalar_subquery(),
+              UpcomingShows.artist_image_link: db.select(Artist.image_link).where(Artist.id == key).scalar_subquery()}
+  UpcomingShows.query.filter(key.in_(ids)).update(values, synchronize_session=False)
+
+#----------------------------------------------------------------------------#
+# Availability.
+#----------------------------------------------------------------------------#
+
+# A show is booked only if neither its venue nor its artist has another show
+# touching its time. Bookings first lock the venue and artist rows (FOR
+# UPDATE on PostgreSQL; SQLite allows a single writer anyway), so two
+# requests booking the same venue or artist are serialised and the second
+# one sees the first one's show when it checks.
+#
+# No show may last longer than MAX_SHOW_LENGTH (ck_shows_length holds stored
+# rows to it too), so a show touching [start, end] started no earlier than
+# start - MAX_SHOW_LENGTH. touching() adds that
+# lower bound, which keeps the range scans on the start_time indexes to a
+# few days of shows instead of the whole booking history.
+
+MAX_SHOW_LENGTH = timedelta(hours=app.config['MAX_SHOW_HOURS'])
+
+def touching(start, end):
+  # Filter conditions for the shows touching [start, end].
+  return (Shows.start_time >= start - MAX_SHOW_LENGTH, Shows.start_time <= end, Shows.end_time >= start)
+
+def lock_owners(venue_ids, artist_ids):
+  # Locks the given venues and artists, in id order so that concurrent
+  # bookings can't deadlock, and returns the ids that exist.
+  venues = set(id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)).order_by(Venue.id).with_for_update())
+  artists = set(id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids)).order_by(Artist.id).with_for_update())
+  return venues, artists
+
+def book_show(venue_id, artist_id, start_time, end_time):
+  # Adds the show and returns it, or returns None when the venue or artist
+  # doesn't exist or is already booked, or the show is longer than
+  # MAX_SHOW_LENGTH; the caller commits.
+  if end_time - start_time > MAX_SHOW_LENGTH:
+    return None
+  venues, artists = lock_owners([venue_id], [artist_id])
+  if venue_id not in venues or artist_id not in artists:
+    return None
+  if not show_validation(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time):
+    return None
+  show = Shows(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time)
+  db.session.add(show)
+  db.session.flush()
+  if start_time > datetime.now():
+    add_upcoming_show(venue_id, artist_id)
+    add_to_upcoming_feed([show.id])
+  return show
+
+def venue_bookings(venue_id, start, end):
+  # The venue's shows touching [start, end], with their artists, by start time.
+  shows = Shows.query.with_entities(Shows.id, Shows.artist_id, Artist.name, Artist.image_link, Shows.start_time, Shows.end_time).join(
+    Artist, Artist.id == Shows.artist_id).filter(
+    Shows.venue_id == venue_id, *touching(start, end)).order_by(Shows.start_time, Shows.id)
+  return [{'id': id, 'artist_id': artist_id, 'artist_name': name, 'artist_image_link': image_link,
+           'start_time': start_time, 'end_time': end_time}
+          for id, artist_id, name, image_link, start_time, end_time in shows]
+
+def free_artists(start, end):
+  # Artists with no show touching [start, end]; one NOT EXISTS probe of the
+  # (artist_id, start_time, end_time) index per artist.
+  busy = Shows.query.filter(Shows.artist_id == Artist.id, *touching(start, end))
+  return Artist.query.with_entities(Artist.id, Artist.name, Artist.city, Artist.state).filter(~busy.exists())
+
+def calendar_day():
+  # The ?date= (or ?start=) day, today by default.
+  value = request.args.get('date') or request.args.get('start')
+  if not value:
+    return datetime.now().date()
+  try:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+  except ValueError:
+    abort(400)
+
+def int_arg(name, default, low, high):
+  try:
+    value = int(request.args.get(name, default))
+  except ValueError:
+    abort(400)
+  return min(max(value, low), high)
+
+#----------------------------------------------------------------------------#
+# Locations.
+#----------------------------------------------------------------------------#
+
+# Venues are placed at their city's entry in gazetteer.csv when written,
+# and existing venues by `flask geocode-venues`; /venues/nearby finds them
+# through the geohash index.
+
+VENUE_LOCATION = ['latitude', 'longitude', 'geohash']
+
+def gazetteer():
+  if 'gazetteer' not in app.extensions:
+    app.extensions['gazetteer'] = read_gazetteer()
+  return app.extensions['gazetteer']
+
+def locate_venue(venue):
+  venue.latitude, venue.longitude, venue.geohash = locate(gazetteer(), venue.city, venue.state)
+
+def locate_rows(model, rows, columns):
+  # Adds the position of each venue to its column dict; returns columns plus
+  # the location columns for venues, and columns unchanged otherwise.
+  if model is not Venue:
+    return columns
+  for row in rows:
+    row['latitude'], row['longitude'], row['geohash'] = locate(gazetteer(), row['city'], row['state'])
+  return columns + VENUE_LOCATION
+
+def nearby_venues(latitude, longitude, radius_km, limit):
+  # Up to limit venues within radius_km, nearest first, as (distance, row).
+  cells = covering_cells(latitude, longitude, radius_km)
+  venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.image_link,
+                            Venue.latitude, Venue.longitude, Venue.upcoming_shows_count).filter(
+    db.or_(*[db.and_(Venue.geohash >= cell, Venue.geohash < prefix_end(cell)) for cell in cells]))
+  found = []
+  for venue in venues:
+    distance = distance_km(latitude, longitude, venue.latitude, venue.longitude)
+    if distance <= radius_km:
+      found.append((distance, venue))
+  found.sort(key=lambda match: (match[0], match[1].id))
+  return found[:limit]
+
+def nearby_origin():
+  # (latitude, longitude) from ?lat= and ?lng=, or else the gazetteer entry
+  # for ?city= and ?state=; None when neither is given or the city isn't
+  # listed.
+  if 'lat' in request.args or 'lng' in request.args:
+    return float_arg('lat', -90, 90), float_arg('lng', -180, 180)
+  latitude, longitude, geohash = locate(gazetteer(), request.args.get('city'), request.args.get('state'))
+  if latitude is None:
+    return None
+  return latitude, longitude
+
+def float_arg(name, low, high, default=None):
+  value = request.args.get(name, default)
+  try:
+    value = float(value)
+  except (TypeError, ValueError):
+    abort(400)
+  if not low <= value <= high:
+    abort(400)
+  return value
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_backend():
+  # pg_trgm indexed search on PostgreSQL, an in-process trigram index elsewhere.
+  if 'search' not in app.extensions:
+    app.extensions['search'] = search_backend_for(db.engine, on_primary, app.config['NAME_INDEX_MAX_AGE'])
+  return app.extensions['search']
+
+def autocomplete():
+  # In-memory prefix indexes of venue and artist names, for /api/autocomplete.
+  if 'autocomplete' not in app.extensions:
+    app.extensions['autocomplete'] = Autocomplete(on_primary, app.config['NAME_INDEX_MAX_AGE'])
+  return app.extensions['autocomplete']
+
+def index_name(model, id, name):
+  # Called by the write handlers once a name is committed.
+  search_backend().add(model, id, name)
+  autocomplete().add(model, id, name)
+
+def unindex_name(model, id):
+  search_backend().remove(model, id)
+  autocomplete().remove(model, id)
+
+def search_page():
+  # search forms post the requested page along with the search term.
+  try:
+    return max(int(request.form.get('page', 1)), 1)
+  except ValueError:
+    return 1
+
+#----------------------------------------------------------------------------#
+# Replica routing.
+#----------------------------------------------------------------------------#
+
+# With DATABASE_REPLICA_URLS set, requests to the read-only REPLICA_ENDPOINTS
+# pick a replica bind for all of their queries (see RoutingSession). Writes
+# mark the client's session, so the pages it is redirected to, and anything
+# else it asks for within REPLICA_LAG_SECONDS, read its writes back from the
+# primary.
+
+REPLICA_BINDS = sorted(key for key in app.config['SQLALCHEMY_BINDS'] if key.startswith('replica_'))
+
+@app.before_request
+def choose_replica():
+  g.db_replica = None
+  if not REPLICA_BINDS or request.endpoint not in app.config['REPLICA_ENDPOINTS']:
+    return
+  if session.get('read_primary_until', 0) > time.time():
+    return
+  g.db_replica = random.choice(REPLICA_BINDS)
+
+@contextmanager
+def on_primary():
+  # Runs the enclosed queries on the primary, even in a replica-routed request.
+  replica = g.pop('db_replica', None) if has_request_context() else None
+  try:
+    yield
+  finally:
+    if replica is not None:
+      g.db_replica = replica
+
+@app.after_request
+def remember_write(response):
+  if REPLICA_BINDS and request.method not in ('GET', 'HEAD', 'OPTIONS') and request.endpoint not in app.config['REPLICA_ENDPOINTS']:
+    session['read_primary_until'] = time.time() + app.config['REPLICA_LAG_SECONDS']
+  return response
+
+#----------------------------------------------------------------------------#
+# Caching.
+#----------------------------------------------------------------------------#
+
+# Listing data is cached per URL in the backend chosen by CACHE_TYPE and
+# dropped by view_cache.invalidate() in the write handlers.
+view_cache = view_cache_from_config(app.config)
+
+def cached(namespaces, load):
+  # Data for the current URL, rebuilt by load() after a write to any of namespaces.
+  fresh_for = app.config['REPLICA_LAG_SECONDS'] if g.get('db_replica') else 0
+  return view_cache.get_or_set(tuple(namespaces), request.full_path, load, fresh_for)
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+# Listings are paged by seeking past the sort key of the last row shown
+# (keyset pagination) rather than with OFFSET, so every page costs the same
+# index range scan no matter how deep into the table it is. Cursors are the
+# sort key values of the boundary row, JSON encoded and base64'd.
+
+def encode_cursor(row, columns):
+  values = []
+  for column in columns:
+    value = getattr(row, column.key)
+    values.append(value.isoformat() if isinstance(value, datetime) else value)
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, columns):
+  # The sort key values in cursor, checked against columns; any cursor not
+  # made by encode_cursor() for these columns is a 400.
+  if not cursor:
+    return None
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(values, list) or len(values) != len(columns):
+      raise ValueError(cursor)
+    return [cursor_value(value, column) for value, column in zip(values, columns)]
+  except (ValueError, TypeError, OverflowError):
+    abort(400)
+
+def cursor_value(value, column):
+  if value is None and column.nullable:
+    return None
+  if isinstance(column.type, db.DateTime) and isinstance(value, str):
+    return dateutil.parser.parse(value)
+  if isinstance(column.type, db.Integer) and isinstance(value, int) and not isinstance(value, bool):
+    return value
+  if isinstance(column.type, db.String) and isinstance(value, str):
+    return value
+  raise ValueError(value)
+
+def page_size():
+  try:
+    size = int(request.args.get('limit', app.config['PAGE_SIZE']))
+  except ValueError:
+    abort(400)
+  return min(max(size, 1), app.config['MAX_PAGE_SIZE'])
+
+def keyset_page(query, columns):
+  # Returns one page of query ordered by columns, following the ?after= or
+  # ?before= cursor, plus the cursors of the next and previous pages.
+  size = page_size()
+  after = decode_cursor(request.args.get('after'), columns)
+  before = decode_cursor(request.args.get('before'), columns)
+  if before is not None:
+    rows = query.filter(tuple_(*columns) < tuple_(*before)).order_by(*[column.desc() for column in columns]).limit(size + 1).all()
+    has_previous = len(rows) > size
+    rows = rows[:size][::-1]
+    next_cursor = encode_cursor(rows[-1], columns) if rows else None
+    previous_cursor = encode_cursor(rows[0], columns) if has_previous else None
+  else:
+    if after is not None:
+      query = query.filter(tuple_(*columns) > tuple_(*after))
+    rows = query.order_by(*columns).limit(size + 1).all()
+    has_next = len(rows) > size
+    rows = rows[:size]
+    next_cursor = encode_cursor(rows[-1], columns) if has_next else None
+    previous_cursor = encode_cursor(rows[0], columns) if after is not None and rows else None
+  return rows, {'next': next_cursor, 'previous': previous_cursor}
+
+def wants_json():
+  return request.args.get('format') == 'json'
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="dd, MM, y EE h:mma"
-  return babel.dates.format_datetime(date, format)
+# Show tiles format every start and end time, so parsed Babel patterns are
+# kept per (format, locale), and formatted values in an LRU big enough for
+# the start and end times of a 10k-show page.
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "dd, MM, y EE h:mma",
+}
+DATETIME_CACHE_SIZE = 32768
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def formatted_datetime(value, format, locale):
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale=None):
+  # value is a datetime, or a string dateutil can parse.
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  return formatted_datetime(value, format, locale or babel.dates.LC_TIME)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Instrumentation.
+#----------------------------------------------------------------------------#
+
+# Every request records its SQL statement count and time, template render
+# time and slowest statements. The totals are sent back in a Server-Timing
+# header, summed per endpoint for /_metrics, and statements slower than
+# SLOW_QUERY_SECONDS are written to the slow query log.
+
+endpoint_metrics = EndpointMetrics()
+
+slow_query_log = logging.getLogger('fyyur.slow_queries')
+slow_query_log.setLevel(logging.INFO)
+slow_query_log.propagate = False
+slow_query_handler = FileHandler(app.config['SLOW_QUERY_LOG'])
+slow_query_handler.setFormatter(Formatter('%(asctime)s %(message)s'))
+slow_query_log.addHandler(slow_query_handler)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+  seconds = time.perf_counter() - conn.info['query_started'].pop()
+  if seconds >= app.config['SLOW_QUERY_SECONDS']:
+    slow_query_log.info('%.1fms %s %s', seconds * 1000, request.endpoint if has_request_context() else '-', ' '.join(statement.split()))
+  if has_request_context():
+    g.query_count = g.get('query_count', 0) + 1
+    g.db_seconds = g.get('db_seconds', 0.0) + seconds
+    g.slowest_queries = sorted(g.get('slowest_queries', []) + [(seconds, statement)], reverse=True)[:SLOWEST_KEPT]
+
+@event.listens_for(Engine, 'handle_error')
+def drop_query_timer(context):
+  # a failed statement never reaches after_cursor_execute
+  connection = context.connection
+  if connection is not None and connection.info.get('query_started'):
+    connection.info['query_started'].pop()
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+  if has_request_context():
+    g.render_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+  if has_request_context() and 'render_started' in g:
+    g.render_seconds = g.get('render_seconds', 0.0) + time.perf_counter() - g.pop('render_started')
+
+@app.before_request
+def start_request_timer():
+  g.request_started = time.perf_counter()
+  g.query_count = 0
+  g.db_seconds = 0.0
+  g.render_seconds = 0.0
+  g.slowest_queries = []
+
+@app.after_request
+def record_request_metrics(response):
+  seconds = time.perf_counter() - g.get('request_started', time.perf_counter())
+  endpoint_metrics.record(request.endpoint or 'unknown', seconds, g.query_count,
+                          g.db_seconds, g.render_seconds, g.slowest_queries)
+  response.headers['Server-Timing'] = 'db;dur={0:.1f};desc="{1} queries", render;dur={2:.1f}, total;dur={3:.1f}'.format(
+    g.db_seconds * 1000, g.query_count, g.render_seconds * 1000, seconds * 1000)
+  return response
+
+@app.after_request
+def check_query_budget(response):
+  # Pages listed in QUERY_BUDGETS must not scale their query count with the
+  # number of rows they render; in testing mode going over budget is an error.
+  budget = app.config.get('QUERY_BUDGETS', {}).get(request.endpoint)
+  query_count = g.get('query_count', 0)
+  if budget is not None and query_count > budget:
+    message = 'Endpoint {0} issued {1} queries, budget is {2}.'.format(request.endpoint, query_count, budget)
+    if app.testing:
+      raise AssertionError(message)
+    app.logger.warning(message)
+  return response
+
+pool_metrics = PoolMetrics()
+
+@event.listens_for(Pool, 'connect')
+def count_pool_connect(dbapi_connection, connection_record):
+  pool_metrics.add('connects')
+
+@event.listens_for(Pool, 'checkout')
+def count_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+  pool_metrics.add('checkouts')
+
+@event.listens_for(Pool, 'invalidate')
+def count_pool_invalidation(dbapi_connection, connection_record, exception):
+  pool_metrics.add('invalidations')
+
+@app.route('/_metrics')
+def metrics():
+  text = prometheus_text(endpoint_metrics) + pool_prometheus_text(pool_metrics, db.engine.pool)
+  return Response(text, mimetype='text/plain; version=0.0.4')
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
-def index():
-  error = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%S:%M')
+def recent_listings():
+  # To list recently added Venues and artists on homepage.
   data=[]
   recent_data={}
   venues=[]
   artists=[]
+  venue_list = Venue.query.order_by(db.desc(Venue.id)).limit(10).all()
+  for venue in venue_list:
+    venues.append({
+      'id': venue.id,
+      'name': venue.name
+    })
+  recent_data['venues'] = venues
+  artist_list = Artist.query.order_by(db.desc(Artist.id)).limit(10).all()
+  for artist in artist_list:
+    artists.append({
+      'id': artist.id,
+      'name': artist.name
+    })
+  recent_data['artists'] = artists
+  data.append(recent_data)
+  return data
+
+@app.route('/')
+def index():
+  error = False
+  data=[]
   try:
-      # To list recently added Venues and artists on homepage.
-      venue_list = Venue.query.order_by(db.desc(Venue.id)).limit(10).all()
-      for venue in venue_list:
-        venues.append({
-          'id': venue.id,
-          'name': venue.name
-        })
-      recent_data['venues'] = venues
-      artist_list = Artist.query.order_by(db.desc(Artist.id)).limit(10).all()
-      for artist in artist_list:
-        artists.append({
-          'id': artist.id,
-          'name': artist.name
-        })
-      recent_data['artists'] = artists
-      data.append(recent_data)
+      data = cached(('venues', 'artists'), recent_listings)
   except:
       error= True
       print(sys.exc_info())
@@ -145,58 +751,100 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
+def venue_areas(rows):
+  # Groups a page of venue rows, ordered by city and state, into areas;
+  # upcoming show counts are read from the denormalized counter column.
+  areas=[]
+  for (city, state), venue_rows in groupby(rows, key=lambda row: (row.city, row.state)):
+    areas.append({
+      'city': city,
+      'state': state,
+      'venues': [{
+        'id': row.id,
+        'name': row.name,
+        'num_upcoming_shows': row.upcoming_shows_count
+      } for row in venue_rows]
+    })
+  return areas
+
+def venue_page():
+  venue_list = db.session.query(Venue.city, Venue.state, Venue.id, Venue.name, Venue.upcoming_shows_count)
+  if request.args.get('genre'):
+    # /venues?genre=Jazz browses one genre through the (genre_id, venue_id) index.
+    venue_list = venue_list.join(venue_genres, venue_genres.c.venue_id == Venue.id).join(
+      Genres, Genres.id == venue_genres.c.genre_id).filter(Genres.name == request.args['genre'])
+  rows, cursors = keyset_page(venue_list, [Venue.city, Venue.state, Venue.id])
+  return venue_areas(rows), cursors
+
 @app.route('/venues')
 def venues():
-  # Shows all venues saved in database.
+  # Shows a page of venues saved in database, grouped by city and state.
   error = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%S:%M')
   data=[]
+  cursors={}
   try:
-    venues = Venue.query.with_entities(Venue.city, Venue.state).distinct().order_by(Venue.city, Venue.state)
-    for venue in venues:
-      cities={}
-      cities['city'] = venue.city
-      cities['state'] = venue.state
-      venues=[]
-      venue_list = Venue.query.filter_by(city=venue.city, state=venue.state).order_by('id')
-      for venue_detail in venue_list:
-        # shows_count is aggregated based on number of shows per venue.
-        shows_count = Shows.query.with_entities(Shows.venue_id).filter(Shows.venue_id == venue_detail.id , Shows.start_time > current_time).group_by(Shows.venue_id).count()
-        venues.append({
-          'id': venue_detail.id,
-          'name': venue_detail.name,
-          'num_upcoming_shows': shows_count
-        })
-      cities['venues'] = venues
-      data.append(cities)
+    data, cursors = cached(('venues',), venue_page)
+  except HTTPException:
+    raise
   except:
       error= True
       print(sys.exc_info())
   finally:
         if error:
             flash('An error occurred, Please try after sometime. ')
-  return render_template('pages/venues.html', areas=data);
+  if wants_json():
+    return jsonify(areas=data, cursors=cursors)
+  return render_template('pages/venues.html', areas=data, cursors=cursors);
   
 
+@app.route('/venues/nearby')
+def venues_nearby():
+  # Venues within ?radius= km (25 by default) of ?lat=, ?lng= or of ?city=,
+  # ?state=, nearest first. Without a position, e.g. when the browser's
+  # geolocation is off or refused, the page asks for a city instead.
+  radius = float_arg('radius', 0, app.config['NEARBY_MAX_RADIUS_KM'], app.config['NEARBY_RADIUS_KM'])
+  origin = nearby_origin()
+  if origin is None:
+    if wants_json():
+      abort(400)
+    return render_template('pages/nearby_venues.html', venues=None, radius=radius,
+                           states=[state.value for state in State], unknown_city=bool(request.args.get('city')))
+  latitude, longitude = origin
+  data = [{
+    'id': venue.id,
+    'name': venue.name,
+    'city': venue.city,
+    'state': venue.state,
+    'image_link': venue.image_link,
+    'latitude': venue.latitude,
+    'longitude': venue.longitude,
+    'distance_km': round(distance, 2),
+    'num_upcoming_shows': venue.upcoming_shows_count,
+  } for distance, venue in nearby_venues(latitude, longitude, radius, page_size())]
+  if wants_json():
+    return jsonify(venues=data, lat=latitude, lng=longitude, radius=radius)
+  return render_template('pages/nearby_venues.html', venues=data, radius=radius, city=request.args.get('city'),
+                         state=request.args.get('state'))
+
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
   # Case-insensitive search on artists with partial string search.
   error = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%S:%M')
   response={}
   venues=[]
-  venue_search=request.form.get('search_term')
+  venue_search=request.form.get('search_term', '')
+  page = search_page()
+  page_size = app.config['SEARCH_PAGE_SIZE']
   try:
-    venue_list = Venue.query.filter(Venue.name.ilike('%'+venue_search+'%')).all()
-    match_count = len(venue_list)
+    match_count, venue_list = search_backend().search(Venue, venue_search, page_size, (page - 1) * page_size)
     response['count'] = match_count
+    response['page'] = page
+    response['pages'] = (match_count + page_size - 1) // page_size
     for venue_detail in venue_list:
-      # shows_count is aggregated based on number of shows per venue.
-      shows_count = Shows.query.with_entities(Shows.venue_id).filter(Shows.venue_id == venue_detail.id , Shows.start_time > current_time).group_by(Shows.venue_id).count()
       venues.append({
         'id': venue_detail.id,
         'name': venue_detail.name,
-        'num_upcoming_shows': shows_count
+        'num_upcoming_shows': venue_detail.upcoming_shows_count
       })
     response['data'] = venues
   except:
@@ -212,15 +860,15 @@ def search_venues():
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   error = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+  current_time = datetime.now()
   response={}
   past_shows=[]
   upcoming_shows=[]
   try:
-    venue_detail = Venue.query.filter_by(id = venue_id).first()
+    venue_detail = Venue.query.options(db.joinedload(Venue.genres)).filter_by(id = venue_id).first()
     response['id'] = venue_detail.id
     response['name'] = venue_detail.name
-    response['genres'] =  venue_detail.genres.split(','), # convert string to list
+    response['genres'] =  [genre.name for genre in venue_detail.genres]
     response['address'] =  venue_detail.address
     response['city'] =  venue_detail.city
     response['state'] =  venue_detail.state
@@ -231,23 +879,24 @@ def show_venue(venue_id):
     response['seeking_description']= venue_detail.seeking_description
     response['image_link'] = venue_detail.image_link
     
-    shows = Shows.query.filter_by(venue_id = venue_detail.id).order_by('venue_id', 'artist_id')
-    for show in shows:
-      if format_datetime(str(show.start_time)) > format_datetime(current_time) :
-        upcoming_shows.append({
+    # artist rows are joined in up front so each show tile doesn't lazy-load its artist.
+    # past and upcoming are split by the database on the start_time column.
+    shows = Shows.query.options(db.joinedload(Shows.artist_shows)).filter_by(venue_id = venue_detail.id)
+    for show in shows.filter(Shows.start_time > current_time).order_by(Shows.start_time):
+      upcoming_shows.append({
+        'artist_id': show.artist_id,
+        'artist_name': show.artist_shows.name,
+        'artist_image_link': show.artist_shows.image_link,
+        'start_time': show.start_time,
+        'end_time': show.end_time
+      })
+    for show in shows.filter(Shows.start_time <= current_time).order_by(db.desc(Shows.start_time)):
+      past_shows.append({
           'artist_id': show.artist_id,
           'artist_name': show.artist_shows.name,
           'artist_image_link': show.artist_shows.image_link,
-          'start_time': str(show.start_time),
-          'end_time': str(show.end_time)
-        })
-      else:
-        past_shows.append({
-            'artist_id': show.artist_id,
-            'artist_name': show.artist_shows.name,
-            'artist_image_link': show.artist_shows.image_link,
-            'start_time': str(show.start_time)
-        })
+          'start_time': show.start_time
+      })
     response['past_shows'] = past_shows
     response['upcoming_shows'] = upcoming_shows
     response['past_shows_count'] = len(past_shows)
@@ -261,6 +910,32 @@ def show_venue(venue_id):
   #data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
   return render_template('pages/show_venue.html', venue=response)
 
+@app.route('/venues/<int:venue_id>/calendar')
+def venue_calendar(venue_id):
+  # The venue's shows and free slots, day by day, for ?days= days from ?start=;
+  # free slots shorter than ?min_hours= are left out.
+  day = calendar_day()
+  days = int_arg('days', 7, 1, 62)
+  min_length = timedelta(hours=int_arg('min_hours', 1, 0, 24))
+  venue = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state).filter_by(id=venue_id).first()
+  if venue is None:
+    abort(404)
+  start, end = day_range(day, days)
+  bookings = venue_bookings(venue_id, start, end)
+  # nothing before now is free to book
+  slots = free_slots([(show['start_time'], show['end_time']) for show in bookings],
+                     max(start, datetime.now().replace(second=0, microsecond=0)), end, min_length)
+  calendar = calendar_days(day, days, bookings, slots)
+  if wants_json():
+    return jsonify(venue=venue._asdict(), days=[{
+      'date': entry['date'].isoformat(),
+      'shows': [dict(show, start_time=show['start_time'].isoformat(), end_time=show['end_time'].isoformat())
+                for show in entry['shows']],
+      'free': [{'start_time': slot_start.isoformat(), 'end_time': slot_end.isoformat()} for slot_start, slot_end in entry['free']],
+    } for entry in calendar])
+  return render_template('pages/venue_calendar.html', venue=venue, calendar=calendar, days=days,
+                         previous=day - timedelta(days=days), next=day + timedelta(days=days))
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
@@ -281,7 +956,7 @@ def create_venue_submission():
     if 'seeking_description' in request.form:
       seeking_description = request.form['seeking_description']
     name = request.form['name']
-    genres = request.form.getlist('genres')
+    genres = genres_from_names(request.form.getlist('genres'))
     city = request.form['city']
     state = request.form['state']
     phone = request.form['phone']
@@ -292,8 +967,11 @@ def create_venue_submission():
     seeking_description = seeking_description
     image_link = request.form['image_link']
     venue = Venue(name = name, genres = genres, city = city, state = state, phone = phone, address = address, website = website, facebook_link = facebook_link, seeking_talent = seeking_talent, seeking_description = seeking_description, image_link = image_link)
+    locate_venue(venue)
     db.session.add(venue)
     db.session.commit()
+    index_name(Venue, venue.id, name)
+    view_cache.invalidate('venues')
   except:
     error= True
     db.session.rollback()
@@ -316,9 +994,17 @@ def delete_venue(venue_id):
   # clicking that button delete it from the db then redirect the user to the homepage
   error = False
   try:
+    # artists lose the upcoming shows they had at this venue.
+    artist_ids = [row.artist_id for row in Shows.query.with_entities(Shows.artist_id).filter(
+      Shows.venue_id == venue_id, Shows.start_time > datetime.now()).distinct()]
+    UpcomingShows.query.filter_by(venue_id = venue_id).delete()
     Shows.query.filter_by(venue_id = venue_id).delete()
+    db.session.execute(venue_genres.delete().where(venue_genres.c.venue_id == venue_id))
     Venue.query.filter_by(id=venue_id).delete()
+    recount_upcoming_shows(Artist, artist_ids)
     db.session.commit()
+    unindex_name(Venue, int(venue_id))
+    view_cache.invalidate('venues', 'shows')
   except:
     error= True
     db.session.rollback()
@@ -335,18 +1021,39 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  # All artist details stored in the database
-  error = False
+def artist_page():
   data=[]
-  artist_list = Artist.query.order_by(Artist.id).all()
+  artist_list = Artist.query.with_entities(Artist.id, Artist.name)
+  if request.args.get('genre'):
+    # /artists?genre=Jazz browses one genre through the (genre_id, artist_id) index.
+    artist_list = artist_list.join(artist_genres, artist_genres.c.artist_id == Artist.id).join(
+      Genres, Genres.id == artist_genres.c.genre_id).filter(Genres.name == request.args['genre'])
+  artist_list, cursors = keyset_page(artist_list, [Artist.id])
   for artist in artist_list:
     data.append({
       'id': artist.id,
       'name': artist.name
     })
-  return render_template('pages/artists.html', artists=data)
+  return data, cursors
+
+@app.route('/artists')
+def artists():
+  # A page of artist details stored in the database
+  data, cursors = cached(('artists',), artist_page)
+  if wants_json():
+    return jsonify(artists=data, cursors=cursors)
+  return render_template('pages/artists.html', artists=data, cursors=cursors)
+
+@app.route('/artists/available')
+def available_artists():
+  # A page of the artists with no show on ?date= (today by default).
+  day = calendar_day()
+  start, end = day_range(day)
+  artist_list, cursors = keyset_page(free_artists(start, end), [Artist.id])
+  data = [artist._asdict() for artist in artist_list]
+  if wants_json():
+    return jsonify(date=day.isoformat(), artists=data, cursors=cursors)
+  return render_template('pages/available_artists.html', artists=data, cursors=cursors, date=day)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -354,21 +1061,21 @@ def search_artists():
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
   error = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
   response={}
   artists=[]
-  artist_search=request.form.get('search_term')
+  artist_search=request.form.get('search_term', '')
+  page = search_page()
+  page_size = app.config['SEARCH_PAGE_SIZE']
   try:
-    artist_list = Artist.query.filter(Artist.name.ilike('%'+artist_search+'%')).all()
-    match_count = len(artist_list)
+    match_count, artist_list = search_backend().search(Artist, artist_search, page_size, (page - 1) * page_size)
     response['count'] = match_count
+    response['page'] = page
+    response['pages'] = (match_count + page_size - 1) // page_size
     for artist_detail in artist_list:
-      # shows_count is aggregated based on number of shows per venue.
-      shows_count = Shows.query.with_entities(Shows.artist_id).filter(Shows.artist_id == artist_detail.id , Shows.start_time > current_time).group_by(Shows.artist_id).count()
       artists.append({
         'id': artist_detail.id,
         'name': artist_detail.name,
-        'num_upcoming_shows': shows_count
+        'num_upcoming_shows': artist_detail.upcoming_shows_count
       })
     response['data'] = artists
   except:
@@ -384,15 +1091,15 @@ def show_artist(artist_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
   error = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+  current_time = datetime.now()
   response={}
   past_shows=[]
   upcoming_shows=[]
   try:
-    artist_detail = Artist.query.filter_by(id = artist_id).first()
+    artist_detail = Artist.query.options(db.joinedload(Artist.genres)).filter_by(id = artist_id).first()
     response['id'] = artist_detail.id
     response['name'] = artist_detail.name
-    response['genres'] =  artist_detail.genres.split(','), # convert string to list
+    response['genres'] =  [genre.name for genre in artist_detail.genres]
     response['city'] =  artist_detail.city
     response['state'] =  artist_detail.state
     response['phone'] =  artist_detail.phone
@@ -402,24 +1109,25 @@ def show_artist(artist_id):
     response['seeking_description']= artist_detail.seeking_description
     response['image_link'] = artist_detail.image_link
     
-    shows = Shows.query.filter_by(artist_id = artist_detail.id).order_by('artist_id', 'venue_id')
-    for show in shows:
-      if format_datetime(str(show.start_time)) > format_datetime(current_time) :
-        upcoming_shows.append({
-          'venue_id': show.venue_id,
-          'venue_name': show.venue_shows.name,
-          'venue_image_link': show.venue_shows.image_link,
-          'start_time': str(show.start_time),
-          'end_time': str(show.end_time)
-        })
-      else:
-        past_shows.append({
-          'venue_id': show.venue_id,
-          'venue_name': show.venue_shows.name,
-          'venue_image_link': show.venue_shows.image_link,
-          'start_time': str(show.start_time),
-          'end_time': str(show.end_time)
-        })
+    # venue rows are joined in up front so each show tile doesn't lazy-load its venue.
+    # past and upcoming are split by the database on the start_time column.
+    shows = Shows.query.options(db.joinedload(Shows.venue_shows)).filter_by(artist_id = artist_detail.id)
+    for show in shows.filter(Shows.start_time > current_time).order_by(Shows.start_time):
+      upcoming_shows.append({
+        'venue_id': show.venue_id,
+        'venue_name': show.venue_shows.name,
+        'venue_image_link': show.venue_shows.image_link,
+        'start_time': show.start_time,
+        'end_time': show.end_time
+      })
+    for show in shows.filter(Shows.start_time <= current_time).order_by(db.desc(Shows.start_time)):
+      past_shows.append({
+        'venue_id': show.venue_id,
+        'venue_name': show.venue_shows.name,
+        'venue_image_link': show.venue_shows.image_link,
+        'start_time': show.start_time,
+        'end_time': show.end_time
+      })
     response['past_shows'] = past_shows
     response['upcoming_shows'] = upcoming_shows
     response['past_shows_count'] = len(past_shows)
@@ -442,7 +1150,7 @@ def edit_artist(artist_id):
   artist={
     "id": artist_id,
     "name": artist_list.name,
-    "genres": artist_list.genres,
+    "genres": [genre.name for genre in artist_list.genres],
     "city": artist_list.city,
     "state": artist_list.state,
     "phone": artist_list.phone,
@@ -482,7 +1190,7 @@ def edit_artist_submission(artist_id):
         seeking_description = request.form['seeking_description']
     artist = Artist.query.get(artist_id)
     artist.name = request.form.get('name')
-    artist.genres = request.form.getlist('genres')
+    artist.genres = genres_from_names(request.form.getlist('genres'))
     artist.city = request.form.get('city')
     artist.state = request.form.get('state')
     artist.phone = request.form.get('phone')
@@ -491,7 +1199,10 @@ def edit_artist_submission(artist_id):
     artist.seeking_venue = request.form['seeking_talent'] == 'y'
     artist.seeking_description = request.form['seeking_description']
     artist.image_link = request.form.get('image_link')
+    rename_in_upcoming_feed(Artist, [artist.id])
     db.session.commit()
+    index_name(Artist, artist_id, request.form.get('name'))
+    view_cache.invalidate('artists')
   except:
     error= True
     db.session.rollback()
@@ -512,7 +1223,7 @@ def edit_venue(venue_id):
   # populate form with fields from venue with ID <venue_id>
   venue_details = Venue.query.get(venue_id)
   form.name.data = venue_details.name
-  form.genres.data = venue_details.genres
+  form.genres.data = [genre.name for genre in venue_details.genres]
   form.address.data = venue_details.address
   form.city.data = venue_details.city
   form.state.data = venue_details.state
@@ -525,7 +1236,7 @@ def edit_venue(venue_id):
   venue={
     "id": venue_id,
     "name": venue_details.name,
-    "genres": venue_details.genres,
+    "genres": [genre.name for genre in venue_details.genres],
     "address": venue_details.address,
     "city": venue_details.city,
     "state": venue_details.state,
@@ -548,7 +1259,7 @@ def edit_venue_submission(venue_id):
   try:
     venue = Venue.query.get(venue_id)
     venue.name = request.form.get('name')
-    venue.genres = request.form.getlist('genres')
+    venue.genres = genres_from_names(request.form.getlist('genres'))
     venue.address = request.form.get('address')
     venue.city = request.form.get('city')
     venue.state = request.form.get('state')
@@ -558,7 +1269,11 @@ def edit_venue_submission(venue_id):
     venue.seeking_talent = request.form['seeking_talent'] == 'y'
     venue.seeking_description = request.form['seeking_description']
     venue.image_link = request.form.get('image_link')
+    locate_venue(venue)
+    rename_in_upcoming_feed(Venue, [venue.id])
     db.session.commit()
+    index_name(Venue, venue_id, request.form.get('name'))
+    view_cache.invalidate('venues')
   except:
     error= True
     db.session.rollback()
@@ -597,7 +1312,7 @@ def create_artist_submission():
     city = request.form['city']
     state = request.form['state']
     phone = request.form['phone']
-    genres = request.form.getlist('genres')
+    genres = genres_from_names(request.form.getlist('genres'))
     website = request.form['website']
     facebook_link = request.form['facebook_link']
     seeking_venue = seeking_venue
@@ -607,6 +1322,8 @@ def create_artist_submission():
     artist = Artist(name = name, city = city, state = state, phone = phone, genres = genres, website = website, facebook_link = facebook_link, seeking_venue = seeking_venue, seeking_description = seeking_description , image_link = image_link)
     db.session.add(artist)
     db.session.commit()
+    index_name(Artist, artist.id, name)
+    view_cache.invalidate('artists')
   except:
     error= True
     db.session.rollback()
@@ -627,9 +1344,17 @@ def delete_artist(artist_id):
   # clicking that button delete it from the db then redirect the user to the homepage
   error = False
   try:
+    # venues lose the upcoming shows this artist had booked with them.
+    venue_ids = [row.venue_id for row in Shows.query.with_entities(Shows.venue_id).filter(
+      Shows.artist_id == artist_id, Shows.start_time > datetime.now()).distinct()]
+    UpcomingShows.query.filter_by(artist_id = artist_id).delete()
     Shows.query.filter_by(artist_id = artist_id).delete()
+    db.session.execute(artist_genres.delete().where(artist_genres.c.artist_id == artist_id))
     Artist.query.filter_by(id=artist_id).delete()
+    recount_upcoming_shows(Venue, venue_ids)
     db.session.commit()
+    unindex_name(Artist, artist_id)
+    view_cache.invalidate('artists', 'shows', 'venues')
   except:
     error= True
     db.session.rollback()
@@ -647,30 +1372,68 @@ def delete_artist(artist_id):
 #  Shows
 #  ----------------------------------------------------------------
 
+def show_page():
+  data=[]
+  show_list = Shows.query.options(db.joinedload(Shows.venue_shows), db.joinedload(Shows.artist_shows))
+  show_list, cursors = keyset_page(show_list, [Shows.start_time, Shows.id])
+  for show in show_list:
+    data.append({
+      'venue_id': show.venue_id,
+      'venue_name': show.venue_shows.name,
+      'artist_id': show.artist_id,
+      'artist_name': show.artist_shows.name,
+      "artist_image_link": show.artist_shows.image_link,
+      'start_time': show.start_time,
+      'end_time': show.end_time
+  })
+  return data, cursors
+
 @app.route('/shows')
 def shows():
-  # displays list of shows at /shows
+  # displays a page of shows at /shows, in order of start time
   error = False
   data=[]
+  cursors={}
   try:
-    show_list = Shows.query.order_by('venue_id', 'artist_id').all()
-    for show in show_list:
-      data.append({
-        'venue_id': show.venue_id,
-        'venue_name': show.venue_shows.name,
-        'artist_id': show.artist_id,
-        'artist_name': show.artist_shows.name,
-        "artist_image_link": show.artist_shows.image_link,
-        'start_time': str(show.start_time),
-        'end_time': str(show.end_time)
-    })
+    data, cursors = cached(('shows', 'venues', 'artists'), show_page)
+  except HTTPException:
+    raise
   except:
     error= True
     print(sys.exc_info())
   finally:
     if error:
       flash('An error occurred, Please try after sometime. ')
-  return render_template('pages/shows.html', shows=data)
+  if wants_json():
+    data = [dict(show, start_time=str(show['start_time']), end_time=str(show['end_time'])) for show in data]
+    return jsonify(shows=data, cursors=cursors)
+  return render_template('pages/shows.html', shows=data, cursors=cursors)
+
+def upcoming_show_page():
+  # Reads only the upcoming_shows feed, through its (start_time, show_id) index.
+  data=[]
+  show_list = UpcomingShows.query.filter(UpcomingShows.start_time > datetime.now())
+  show_list, cursors = keyset_page(show_list, [UpcomingShows.start_time, UpcomingShows.show_id])
+  for show in show_list:
+    data.append({
+      'venue_id': show.venue_id,
+      'venue_name': show.venue_name,
+      'artist_id': show.artist_id,
+      'artist_name': show.artist_name,
+      'artist_image_link': show.artist_image_link,
+      'start_time': show.start_time,
+      'end_time': show.end_time
+    })
+  return data, cursors
+
+@app.route('/shows/upcoming')
+def upcoming_shows():
+  # displays a page of the shows still to come, soonest first
+  data, cursors = cached(('shows', 'venues', 'artists'), upcoming_show_page)
+  if wants_json():
+    data = [dict(show, start_time=str(show['start_time']), end_time=str(show['end_time'])) for show in data]
+    return jsonify(shows=data, cursors=cursors)
+  return render_template('pages/shows.html', shows=data, cursors=cursors)
 
 @app.route('/shows/create')
 def create_shows():
@@ -684,22 +1447,19 @@ def create_show_submission():
   # insert form data as a new Show record in the db, instead
   error= False
   success = False
-  current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+  current_time = datetime.now()
   try:
-    artist_id = request.form['artist_id']
-    venue_id = request.form['venue_id']
-    start_time = request.form['start_time']
-    end_time = request.form['end_time']
-    if (format_datetime(str(end_time)) > format_datetime(str(start_time))):
-      if (format_datetime(str(start_time)) >= format_datetime(str(current_time))):
-        venue = Venue.query.get(venue_id)
-        artist = Artist.query.get(artist_id)
-        #Data validation for Venue and artist presence in Database 
-        validate = show_validation(venue.id , artist.id , start_time , end_time)
-        if validate:
-          shows = Shows(venue_id = venue_id, artist_id = artist_id , start_time = start_time , end_time= end_time)
-          db.session.add(shows)
+    artist_id = int(request.form['artist_id'])
+    venue_id = int(request.form['venue_id'])
+    start_time = dateutil.parser.parse(request.form['start_time'])
+    end_time = dateutil.parser.parse(request.form['end_time'])
+    if end_time > start_time:
+      if start_time >= current_time:
+        # checks the venue and artist exist and are free, holding their locks until commit
+        if book_show(venue_id, artist_id, start_time, end_time) is not None:
           db.session.commit()
+          # venue listings carry upcoming show counts.
+          view_cache.invalidate('shows', 'venues')
           success = True
   except:
     error= True
@@ -718,17 +1478,634 @@ def create_show_submission():
 
 # function to validate show creation data  
 def show_validation(artist_id , venue_id , start_time , end_time):
-    validated = False
-    if venue_id is not None and artist_id is not None:
-      shows = Shows.query.filter_by(artist_id = artist_id).all()
-      if len(shows) > 0:
-        for show in shows:
-          if (format_datetime(str(show.start_time)) < format_datetime(str(start_time)) 
-            and format_datetime(str(show.end_time)) < format_datetime(str(start_time))) or (format_datetime(str(show.start_time)) > format_datetime(str(end_time)) and format_datetime(str(show.end_time)) > format_datetime(str(end_time))):
-            validated = True
-      else:
-        validated = True
-    return validated
+    # A show is valid when neither the artist nor the venue already has a show
+    # touching [start_time, end_time]; answered by one range query on the
+    # (artist_id/venue_id, start_time, end_time) indexes. Call it through
+    # book_show(), which locks both first.
+    if venue_id is None or artist_id is None:
+      return False
+    overlapping = Shows.query.filter(
+      db.or_(Shows.artist_id == artist_id, Shows.venue_id == venue_id),
+      *touching(start_time, end_time))
+    return not db.session.query(overlapping.exists()).scalar()
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+# Bulk endpoints for the ingestion pipeline. Each accepts a JSON array or
+# NDJSON stream of records, validates every record with the same form the
+# HTML pages use, and writes the valid ones BULK_BATCH_SIZE at a time with
+# executemany-style statements, all in one transaction. Invalid records are
+# skipped and reported by their position in the body, except by
+# /api/v1/tours, which books all of its shows or none.
+
+API_COLUMNS = {
+  Venue: ['name', 'city', 'state', 'address', 'phone', 'website', 'facebook_link',
+          'seeking_talent', 'seeking_description', 'image_link'],
+  Artist: ['name', 'city', 'state', 'phone', 'website', 'facebook_link',
+           'seeking_venue', 'seeking_description', 'image_link'],
+}
+API_FORMS = {Venue: VenueForm, Artist: ArtistForm}
+API_GENRE_LINKS = {Venue: (venue_genres, 'venue_id'), Artist: (artist_genres, 'artist_id')}
+API_NAMESPACES = {Venue: 'venues', Artist: 'artists'}
+
+def api_records():
+  try:
+    for record in read_records(request.stream, request.content_type or ''):
+      yield record
+  except BadRecords as e:
+    abort(400, description=str(e))
+
+def api_error(error):
+  return jsonify(error=error.description), error.code
+
+def api_result(written, ids, errors):
+  # 200 when every record was written, 422 when some were rejected.
+  return jsonify(written=written, ids=ids, errors=errors), 422 if errors else 200
+
+def api_validate(model, record):
+  form = API_FORMS[model](formdata=form_data(record), meta={'csrf': False})
+  if not form.validate():
+    return None, form.errors
+  return form.data, None
+
+def api_genre_ids(rows):
+  names = set(name for row in rows for name in row['genres'])
+  genres = genres_from_names(sorted(names))
+  db.session.flush()
+  return dict((genre.name, genre.id) for genre in genres)
+
+def api_link_genres(model, rows, ids):
+  table, key = API_GENRE_LINKS[model]
+  genre_ids = api_genre_ids(rows)
+  links = [{key: id, 'genre_id': genre_ids[name]} for id, row in zip(ids, rows) for name in set(row['genres'])]
+  if links:
+    db.session.execute(table.insert(), links)
+
+def api_create(model):
+  columns = API_COLUMNS[model]
+  ids, errors, names = [], [], []
+  try:
+    index = 0
+    for chunk in chunked(api_records(), app.config['BULK_BATCH_SIZE']):
+      rows = []
+      for record in chunk:
+        row, row_errors = api_validate(model, record)
+        if row_errors:
+          errors.append({'index': index, 'errors': row_errors})
+        else:
+          rows.append(row)
+        index += 1
+      if not rows:
+        continue
+      written = locate_rows(model, rows, columns)
+      created = db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True),
+                                   [dict((column, row[column]) for column in written) for row in rows])
+      chunk_ids = [id for id, in created]
+      api_link_genres(model, rows, chunk_ids)
+      ids.extend(chunk_ids)
+      names.extend(zip(chunk_ids, (row['name'] for row in rows)))
+    db.session.commit()
+  except HTTPException as e:
+    db.session.rollback()
+    return api_error(e)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return api_error(InternalServerError('records could not be written'))
+  finally:
+    db.session.close()
+  for id, name in names:
+    index_name(model, id, name)
+  if ids:
+    view_cache.invalidate(API_NAMESPACES[model])
+  return api_result(len(ids), ids, errors)
+
+def api_id(record, field):
+  # record[field] when it is an integer id, else None. JSON true and false
+  # are bools, which Python counts as the ints 1 and 0; they are not ids.
+  value = record.get(field)
+  return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def api_update(model):
+  # Records carry the id to update and any fields to change; the merged
+  # record must still pass the form. Each id may appear once per request.
+  columns = API_COLUMNS[model]
+  table, key = API_GENRE_LINKS[model]
+  ids, errors, names = [], [], []
+  seen = set()
+  try:
+    index = 0
+    for chunk in chunked(api_records(), app.config['BULK_BATCH_SIZE']):
+      wanted = [api_id(record, 'id') for record in chunk if api_id(record, 'id') is not None]
+      current = dict((row.id, row) for row in model.query.options(db.selectinload(model.genres)).filter(model.id.in_(wanted)))
+      rows = []
+      for record in chunk:
+        id = api_id(record, 'id')
+        if id is None:
+          id_errors = ['Must be an integer.']
+        elif id in seen:
+          id_errors = ['Repeats the id of an earlier record.']
+        elif id not in current:
+          id_errors = ['No such record.']
+        else:
+          id_errors = None
+        if id_errors:
+          errors.append({'index': index, 'errors': {'id': id_errors}})
+          index += 1
+          continue
+        seen.add(id)
+        existing = current[id]
+        merged = dict((column, getattr(existing, column)) for column in columns)
+        merged['genres'] = [genre.name for genre in existing.genres]
+        merged.update((field, value) for field, value in record.items() if field != 'id')
+        row, row_errors = api_validate(model, merged)
+        if row_errors:
+          errors.append({'index': index, 'errors': row_errors})
+        else:
+          row['id'] = existing.id
+          rows.append(row)
+        index += 1
+      if not rows:
+        continue
+      chunk_ids = [row['id'] for row in rows]
+      written = locate_rows(model, rows, ['id'] + columns)
+      db.session.execute(update(model), [dict((column, row[column]) for column in written) for row in rows])
+      db.session.execute(table.delete().where(table.c[key].in_(chunk_ids)))
+      api_link_genres(model, rows, chunk_ids)
+      rename_in_upcoming_feed(model, chunk_ids)
+      ids.extend(chunk_ids)
+      names.extend((row['id'], row['name']) for row in rows)
+    db.session.commit()
+  except HTTPException as e:
+    db.session.rollback()
+    return api_error(e)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return api_error(InternalServerError('records could not be written'))
+  finally:
+    db.session.close()
+  for id, name in names:
+    index_name(model, id, name)
+  if ids:
+    view_cache.invalidate(API_NAMESPACES[model])
+  return api_result(len(ids), ids, errors)
+
+def api_show_errors(record, venues, artists, now):
+  errors = {}
+  for field, known in (('venue_id', venues), ('artist_id', artists)):
+    if api_id(record, field) not in known:
+      errors[field] = ['No such {0}.'.format(field[:-3])]
+  times = {}
+  for field in ('start_time', 'end_time'):
+    try:
+      times[field] = dateutil.parser.parse(record[field])
+    except (KeyError, TypeError, AttributeError, ValueError, OverflowError):
+      errors[field] = ['Not a valid date and time.']
+  if not errors:
+    if times['end_time'] <= times['start_time']:
+      errors['end_time'] = ['Must be after start_time.']
+    elif times['end_time'] - times['start_time'] > MAX_SHOW_LENGTH:
+      errors['end_time'] = ['Must be at most {0} hours after start_time.'.format(app.config['MAX_SHOW_HOURS'])]
+    elif times['start_time'] < now:
+      errors['start_time'] = ['Must not be in the past.']
+  return errors, times
+
+def api_check_shows(records, first_index, now):
+  # Validates show records numbered from first_index, and rejects any that
+  # overlap a show of its artist or venue, whether already booked or
+  # earlier in records. Locks the venues and artists named, then checks all
+  # the bookings with one range query. Returns the rows to write and the
+  # errors.
+  errors = []
+  wanted_venues = [api_id(record, 'venue_id') for record in records if api_id(record, 'venue_id') is not None]
+  wanted_artists = [api_id(record, 'artist_id') for record in records if api_id(record, 'artist_id') is not None]
+  venues, artists = lock_owners(wanted_venues, wanted_artists)
+  checked = []
+  for index, record in enumerate(records, first_index):
+    record_errors, times = api_show_errors(record, venues, artists, now)
+    if record_errors:
+      errors.append({'index': index, 'errors': record_errors})
+    else:
+      checked.append((index, dict(times, venue_id=record['venue_id'], artist_id=record['artist_id'])))
+  if not checked:
+    return [], errors
+  booked = Calendar()
+  existing = Shows.query.with_entities(Shows.venue_id, Shows.artist_id, Shows.start_time, Shows.end_time).filter(
+    db.or_(Shows.venue_id.in_(set(row['venue_id'] for i, row in checked)),
+           Shows.artist_id.in_(set(row['artist_id'] for i, row in checked))),
+    *touching(min(row['start_time'] for i, row in checked), max(row['end_time'] for i, row in checked)))
+  for venue_id, artist_id, start_time, end_time in existing:
+    booked.add((('venue', venue_id), ('artist', artist_id)), start_time, end_time)
+  rows = []
+  for i, row in checked:
+    keys = (('venue', row['venue_id']), ('artist', row['artist_id']))
+    if booked.conflicts(keys, row['start_time'], row['end_time']):
+      errors.append({'index': i, 'errors': {'start_time': ['Overlaps another show of this artist or venue.']}})
+      continue
+    booked.add(keys, row['start_time'], row['end_time'])
+    rows.append(row)
+  errors.sort(key=lambda error: error['index'])
+  return rows, errors
+
+def api_write_shows(rows):
+  # Inserts the rows and bumps the upcoming show counters; returns the new ids.
+  if not rows:
+    return []
+  created = db.session.execute(insert(Shows).returning(Shows.id, sort_by_parameter_order=True), rows)
+  ids = [id for id, in created]
+  recount_upcoming_shows(Venue, set(row['venue_id'] for row in rows))
+  recount_upcoming_shows(Artist, set(row['artist_id'] for row in rows))
+  add_to_upcoming_feed(ids)
+  return ids
+
+def api_create_shows():
+  # Valid shows are written a chunk at a time and invalid ones reported.
+  ids, errors = [], []
+  try:
+    index = 0
+    now = datetime.now()
+    for chunk in chunked(api_records(), app.config['BULK_BATCH_SIZE']):
+      rows, chunk_errors = api_check_shows(chunk, index, now)
+      index += len(chunk)
+      errors.extend(chunk_errors)
+      ids.extend(api_write_shows(rows))
+    db.session.commit()
+  except HTTPException as e:
+    db.session.rollback()
+    return api_error(e)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return api_error(InternalServerError('records could not be written'))
+  finally:
+    db.session.close()
+  if ids:
+    view_cache.invalidate('shows', 'venues')
+  return api_result(len(ids), ids, errors)
+
+def api_book_tour():
+  # A tour is booked all or nothing: if any of its shows is invalid or
+  # overlaps another, none are written and every problem is reported. A
+  # tour may have up to BULK_BATCH_SIZE shows, checked in one pass.
+  ids = []
+  try:
+    records = list(api_records())
+    if len(records) > app.config['BULK_BATCH_SIZE']:
+      abort(413, description='a tour may have at most {0} shows'.format(app.config['BULK_BATCH_SIZE']))
+    rows, errors = api_check_shows(records, 0, datetime.now())
+    if errors:
+      db.session.rollback()
+      return api_result(0, [], errors)
+    ids = api_write_shows(rows)
+    db.session.commit()
+  except HTTPException as e:
+    db.session.rollback()
+    return api_error(e)
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return api_error(InternalServerError('records could not be written'))
+  finally:
+    db.session.close()
+  if ids:
+    view_cache.invalidate('shows', 'venues')
+  return api_result(len(ids), ids, [])
+
+@app.route('/api/v1/venues', methods=['POST'])
+def api_create_venues():
+  return api_create(Venue)
+
+@app.route('/api/v1/venues', methods=['PATCH'])
+def api_update_venues():
+  return api_update(Venue)
+
+@app.route('/api/v1/artists', methods=['POST'])
+def api_create_artists():
+  return api_create(Artist)
+
+@app.route('/api/v1/artists', methods=['PATCH'])
+def api_update_artists():
+  return api_update(Artist)
+
+@app.route('/api/v1/shows', methods=['POST'])
+def api_create_shows_view():
+  return api_create_shows()
+
+@app.route('/api/v1/tours', methods=['POST'])
+def api_book_tour_view():
+  return api_book_tour()
+
+AUTOCOMPLETE_TYPES = {'venue': Venue, 'artist': Artist}
+
+@app.route('/api/autocomplete')
+def api_autocomplete():
+  # Venue and artist names with a word starting with ?q=, for the pickers
+  # and search boxes; ?type= narrows to venues or artists. Served from
+  # memory without touching the database once the indexes are built.
+  prefix = request.args.get('q', '')
+  limit = int_arg('limit', app.config['AUTOCOMPLETE_LIMIT'], 1, app.config['AUTOCOMPLETE_LIMIT'])
+  kinds = request.args.get('type')
+  if kinds is not None and kinds not in AUTOCOMPLETE_TYPES:
+    abort(400)
+  result = {}
+  for kind, model in AUTOCOMPLETE_TYPES.items():
+    if kinds in (None, kind):
+      result[kind + 's'] = [{'id': id, 'name': name} for id, name in autocomplete().complete(model, prefix, limit)]
+  return jsonify(result)
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+# Venues, artists and shows are exported as CSV or NDJSON, streamed from a
+# yield_per() query (a server-side cursor on PostgreSQL) so memory use does
+# not grow with the catalogue. city and state filter venues and artists,
+# and shows by their venue; start and end bound show start times, end
+# exclusive.
+
+EXPORT_BATCH_SIZE = 1000
+
+def export_rows(kind, city=None, state=None, start=None, end=None):
+  if kind == 'shows':
+    query = db.session.query(Shows.id, Shows.venue_id, Venue.name.label('venue_name'), Shows.artist_id,
+                             Artist.name.label('artist_name'), Shows.start_time, Shows.end_time).join(
+      Venue, Venue.id == Shows.venue_id).join(Artist, Artist.id == Shows.artist_id)
+    owner = Venue
+    if start is not None:
+      query = query.filter(Shows.start_time >= start)
+    if end is not None:
+      query = query.filter(Shows.start_time < end)
+    query = query.order_by(Shows.start_time, Shows.id)
+  else:
+    owner = Venue if kind == 'venues' else Artist
+    query = owner.query.options(db.selectinload(owner.genres)).order_by(owner.id)
+  if city is not None:
+    query = query.filter(owner.city == city)
+  if state is not None:
+    query = query.filter(owner.state == state)
+  columns = EXPORT_COLUMNS[kind]
+  for row in query.yield_per(EXPORT_BATCH_SIZE):
+    if kind == 'shows':
+      yield row._asdict()
+    else:
+      record = dict((column, getattr(row, column)) for column in columns if column != 'genres')
+      record['genres'] = [genre.name for genre in row.genres]
+      yield record
+
+def export_time(value):
+  try:
+    return dateutil.parser.parse(value) if value else None
+  except (ValueError, OverflowError):
+    abort(400, description='Not a valid date and time: ' + value)
+
+@app.route('/export/<any(venues, artists, shows):kind>.<any(csv, ndjson):format>')
+def export(kind, format):
+  rows = export_rows(kind, request.args.get('city') or None, request.args.get('state') or None,
+                     export_time(request.args.get('start')), export_time(request.args.get('end')))
+  response = Response(stream_with_context(export_lines(format, kind, rows)), mimetype=EXPORT_MIMETYPES[format])
+  response.headers['Content-Disposition'] = 'attachment; filename={0}.{1}'.format(kind, format)
+  return response
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('roll-upcoming-shows')
+@click.option('--window', default=60, show_default=True,
+              help='Recount venues and artists with shows that started in the last WINDOW minutes.')
+@click.option('--all', 'recount_all', is_flag=True, help='Recount every venue and artist.')
+def roll_upcoming_shows(window, recount_all):
+  # Run periodically (e.g. from cron, more often than --window) so shows that
+  # have started stop counting as upcoming and leave the upcoming_shows
+  # feed. Recounting is idempotent, so overlapping windows are harmless.
+  # --all also rebuilds the feed.
+  if recount_all:
+    recount_upcoming_shows(Venue)
+    recount_upcoming_shows(Artist)
+    rebuild_upcoming_feed()
+  else:
+    started = Shows.query.filter(Shows.start_time > datetime.now() - timedelta(minutes=window), Shows.start_time <= datetime.now())
+    recount_upcoming_shows(Venue, [row.venue_id for row in started.with_entities(Shows.venue_id).distinct()])
+    recount_upcoming_shows(Artist, [row.artist_id for row in started.with_entities(Shows.artist_id).distinct()])
+    UpcomingShows.query.filter(UpcomingShows.start_time <= datetime.now()).delete(synchronize_session=False)
+  db.session.commit()
+  view_cache.invalidate('venues', 'shows')
+
+@app.cli.command('geocode-venues')
+@click.option('--all', 'geocode_all', is_flag=True, help='Geocode every venue, not only those without a position.')
+@click.option('--batch-size', default=1000, show_default=True)
+def geocode_venues(geocode_all, batch_size):
+  # Places venues at their city's entry in gazetteer.csv. Venues whose city
+  # isn't listed are left without a position.
+  located = checked = 0
+  after = 0
+  while True:
+    venues = db.session.query(Venue.id, Venue.city, Venue.state).filter(Venue.id > after)
+    if not geocode_all:
+      venues = venues.filter(Venue.geohash.is_(None))
+    rows = [{'id': id, 'city': city, 'state': state} for id, city, state in venues.order_by(Venue.id).limit(batch_size)]
+    if not rows:
+      break
+    locate_rows(Venue, rows, [])
+    db.session.execute(update(Venue), [dict((column, row[column]) for column in ['id'] + VENUE_LOCATION) for row in rows])
+    db.session.commit()
+    checked += len(rows)
+    located += sum(1 for row in rows if row['geohash'] is not None)
+    after = rows[-1]['id']
+  view_cache.invalidate('venues')
+  click.echo('located {0} of {1} venues'.format(located, checked))
+
+@app.cli.command('sweep-cache')
+def sweep_cache():
+  # Run from cron with CACHE_TYPE = 'filesystem' to bound CACHE_DIR between
+  # the sweeps set() makes on its own.
+  if not hasattr(view_cache.backend, 'sweep'):
+    click.echo('{0} needs no sweeping'.format(app.config.get('CACHE_TYPE')))
+    return
+  click.echo('removed {0} cache files'.format(view_cache.backend.sweep()))
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--city')
+@click.option('--state')
+@click.option('--start', type=click.DateTime(), help='Only shows starting at or after START.')
+@click.option('--end', type=click.DateTime(), help='Only shows starting before END.')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to standard output.')
+def export_command(kind, format, city, state, start, end, output):
+  for line in export_lines(format, kind, export_rows(kind, city, state, start, end)):
+    output.write(line)
+
+# `flask import venues|artists|shows FILE` loads CSV or NDJSON files in the
+# layout `flask export` writes. Rows are checked against the State and Genre
+# enums, then written CHUNK rows at a time with COPY on PostgreSQL and one
+# executemany INSERT elsewhere, all in one transaction. Show venues and
+# artists are resolved by id or name with one query per chunk. Rows keep
+# the id they carry; others get ids from the table's sequence. Overlapping
+# shows are not rejected, so past catalogues load as they were.
+
+@app.cli.group('import')
+def import_group():
+  """Load catalogue files written by `flask export`."""
+
+def import_file_options(command):
+  # Each import is one transaction. Rows the checks here miss but the
+  # database refuses (e.g. overlapping shows, on PostgreSQL) roll it all back.
+  load = command
+  @wraps(load)
+  def command(*args, **kwargs):
+    try:
+      return load(*args, **kwargs)
+    except IntegrityError as e:
+      db.session.rollback()
+      raise click.ClickException('nothing was imported: {0}'.format(e.orig))
+  command = click.option('--chunk-size', default=5000, show_default=True, help='Rows per COPY or INSERT.')(command)
+  command = click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+                         help='Defaults to the file extension.')(command)
+  return click.argument('path', type=click.Path(exists=True, dir_okay=False))(command)
+
+def import_chunks(path, format, chunk_size, make_row, stats):
+  # Yields lists of valid rows, reporting the invalid ones on stderr.
+  if format is None:
+    format = 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+  with open(path, newline='') as f:
+    for chunk in chunked(read_file(f, format), chunk_size):
+      rows = []
+      for line, record, error in chunk:
+        if error is not None:
+          row, errors = None, {'line': error}
+        else:
+          try:
+            row, errors = make_row(record)
+          except (TypeError, ValueError, AttributeError) as e:
+            # NDJSON values of the wrong JSON type, e.g. genres: 5
+            row, errors = None, {'line': 'could not be read: {0}'.format(e)}
+        if errors:
+          stats['rejected'] += 1
+          for field, error in sorted(errors.items()):
+            click.echo('{0}:{1}: {2} {3}'.format(path, line, field, error), err=True)
+        else:
+          rows.append(row)
+      yield rows
+
+def import_new_ids(model, rows, path, stats):
+  # Drops the rows whose id is already taken, by an existing row or an
+  # earlier one in the file, and reports them; rows without an id are kept.
+  ids = [row['id'] for row in rows if row['id'] is not None]
+  if not ids:
+    return rows
+  taken = set(id for id, in db.session.query(model.id).filter(model.id.in_(set(ids))))
+  kept = []
+  for row in rows:
+    if row['id'] is not None and row['id'] in taken:
+      stats['rejected'] += 1
+      click.echo('{0}: {1} id {2} already exists'.format(path, model.__tablename__, row['id']), err=True)
+      continue
+    if row['id'] is not None:
+      taken.add(row['id'])
+    kept.append(row)
+  return kept
+
+def import_ids(model, rows, next_id):
+  # Gives rows without an id one from the table's sequence. Without
+  # sequences (SQLite), next_id is a one-item list holding the next free id.
+  missing = [row for row in rows if row['id'] is None]
+  if not missing:
+    return
+  if db.engine.dialect.name == 'postgresql':
+    ids = [id for id, in db.session.execute(db.text(
+      "SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+      {'table': model.__tablename__, 'count': len(missing)})]
+  else:
+    if next_id[0] is None:
+      next_id[0] = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+    next_id[0] = max([next_id[0]] + [row['id'] + 1 for row in rows if row['id'] is not None])
+    ids = range(next_id[0], next_id[0] + len(missing))
+    next_id[0] += len(missing)
+  for row, id in zip(missing, ids):
+    row['id'] = id
+
+def import_done(model, stats, label):
+  if db.engine.dialect.name == 'postgresql':
+    # rows loaded with their own ids leave the sequence behind
+    db.session.execute(db.text(
+      "SELECT setval(pg_get_serial_sequence(:table, 'id'), (SELECT coalesce(max(id), 0) + 1 FROM {0}), false)".format(model.__tablename__)),
+      {'table': model.__tablename__})
+  db.session.commit()
+  click.echo('imported {0} {1}, rejected {2}'.format(stats['imported'], label, stats['rejected']))
+
+def import_owners(model, make_row, path, format, chunk_size):
+  table, key = API_GENRE_LINKS[model]
+  columns = ['id'] + API_COLUMNS[model]
+  connection = db.session.connection()
+  genres = genres_from_names(sorted(GENRES))
+  db.session.flush()
+  genre_ids = dict((genre.name, genre.id) for genre in genres)
+  stats, next_id = {'imported': 0, 'rejected': 0}, [None]
+  for rows in import_chunks(path, format, chunk_size, make_row, stats):
+    rows = import_new_ids(model, rows, path, stats)
+    import_ids(model, rows, next_id)
+    load_rows(connection, model.__table__, locate_rows(model, rows, columns), rows)
+    load_rows(connection, table, [key, 'genre_id'],
+              [{key: row['id'], 'genre_id': genre_ids[name]} for row in rows for name in row['genres']])
+    stats['imported'] += len(rows)
+  import_done(model, stats, API_NAMESPACES[model])
+  view_cache.invalidate(API_NAMESPACES[model])
+
+def import_owner_ids(model, rows, prefix):
+  # Resolves <prefix>_id, from <prefix>_name when no id is given, for a chunk
+  # of show rows; returns the rows that could not be resolved.
+  ids = set(row[prefix + '_id'] for row in rows if row[prefix + '_id'] is not None)
+  names = set(row[prefix + '_name'] for row in rows if row[prefix + '_id'] is None)
+  known = set(id for id, in db.session.query(model.id).filter(model.id.in_(ids))) if ids else set()
+  by_name = {}
+  if names:
+    for id, name in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+      by_name.setdefault(name, []).append(id)
+  unresolved = []
+  for row in rows:
+    if row[prefix + '_id'] is None and len(by_name.get(row[prefix + '_name'], ())) == 1:
+      row[prefix + '_id'] = by_name[row[prefix + '_name']][0]
+    elif row[prefix + '_id'] not in known:
+      unresolved.append(row)
+  return unresolved
+
+@import_group.command('venues')
+@import_file_options
+def import_venues(path, format, chunk_size):
+  import_owners(Venue, venue_row, path, format, chunk_size)
+
+@import_group.command('artists')
+@import_file_options
+def import_artists(path, format, chunk_size):
+  import_owners(Artist, artist_row, path, format, chunk_size)
+
+@import_group.command('shows')
+@import_file_options
+def import_shows(path, format, chunk_size):
+  columns = ['id', 'venue_id', 'artist_id', 'start_time', 'end_time']
+  connection = db.session.connection()
+  stats, next_id = {'imported': 0, 'rejected': 0}, [None]
+  make_row = lambda record: show_row(record, MAX_SHOW_LENGTH)
+  for rows in import_chunks(path, format, chunk_size, make_row, stats):
+    unresolved = set()
+    for model, prefix in ((Venue, 'venue'), (Artist, 'artist')):
+      for row in import_owner_ids(model, rows, prefix):
+        unresolved.add(id(row))
+        click.echo('{0}: no single {1} {2}'.format(path, prefix, row[prefix + '_id'] or row[prefix + '_name']), err=True)
+    stats['rejected'] += len(unresolved)
+    rows = import_new_ids(Shows, [row for row in rows if id(row) not in unresolved], path, stats)
+    import_ids(Shows, rows, next_id)
+    load_rows(connection, Shows.__table__, columns, rows)
+    add_to_upcoming_feed([row['id'] for row in rows])
+    stats['imported'] += len(rows)
+  recount_upcoming_shows(Venue)
+  recount_upcoming_shows(Artist)
+  import_done(Shows, stats, 'shows')
+  view_cache.invalidate('shows', 'venues')
 
 @app.errorhandler(404)
 def not_found_error(error):
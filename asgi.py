@@ -0,0 +1,113 @@
+#----------------------------------------------------------------------------#
+# ASGI serving mode.
+#
+#   uvicorn asgi:application --workers 4
+#
+# Requests to the read-heavy ASYNC_ENDPOINTS run on the event loop: the
+# Flask view runs unchanged inside AsyncSession.run_sync(), with db.session
+# bound to the async session for the request, so its ORM queries go through
+# asyncpg (aiosqlite for SQLite) and yield to other requests while waiting
+# on the database instead of holding a thread. Everything else, including
+# every write, is handed to the WSGI app on asgiref's thread pool.
+#
+# Needs asgiref, greenlet, an ASGI server such as uvicorn, and asyncpg or
+# aiosqlite for ASYNC_DATABASE_URI.
+#----------------------------------------------------------------------------#
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from app import app, db
+
+ASYNC_ENDPOINTS = {
+  'index', 'venues', 'artists', 'shows', 'show_venue', 'show_artist',
+  'search_venues', 'search_artists', 'upcoming_shows',
+}
+
+async_engine = create_async_engine(app.config['ASYNC_DATABASE_URI'], **app.config['ASYNC_ENGINE_OPTIONS'])
+async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+wsgi_application = WsgiToAsgi(app)
+
+
+def environ_for(scope, body):
+  headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']]
+  host = dict((name.lower(), value) for name, value in headers).get('host')
+  if host is None:
+    host = '{0}:{1}'.format(*scope['server']) if scope.get('server') else 'localhost'
+  builder = EnvironBuilder(
+    path=scope['path'],
+    base_url='{0}://{1}{2}'.format(scope.get('scheme', 'http'), host, scope.get('root_path', '')),
+    query_string=scope['query_string'].decode('latin-1'),
+    method=scope['method'],
+    headers=headers,
+    data=body,
+    environ_overrides={'REMOTE_ADDR': scope['client'][0] if scope.get('client') else ''})
+  try:
+    return builder.get_environ()
+  finally:
+    builder.close()
+
+
+def endpoint_for(scope):
+  try:
+    endpoint, args = app.url_map.bind('localhost').match(scope['path'], method=scope['method'])
+  except HTTPException:
+    return None
+  return endpoint
+
+
+def dispatch(session, environ):
+  # Runs in SQLAlchemy's greenlet: blocking-style ORM calls made by the
+  # view are awaited on the event loop. Mirrors Flask.wsgi_app().
+  ctx = app.request_context(environ)
+  error = None
+  try:
+    ctx.push()
+    db.session.registry.set(session)
+    try:
+      response = app.full_dispatch_request()
+    except Exception as e:
+      error = e
+      response = app.handle_exception(e)
+    return response.status_code, response.headers.to_wsgi_list(), response.get_data()
+  finally:
+    ctx.pop(error)
+
+
+async def read_body(receive):
+  body = b''
+  more_body = True
+  while more_body:
+    message = await receive()
+    body += message.get('body', b'')
+    more_body = message.get('more_body', False)
+  return body
+
+
+async def application(scope, receive, send):
+  if scope['type'] == 'lifespan':
+    return await lifespan(receive, send)
+  if scope['type'] != 'http' or endpoint_for(scope) not in ASYNC_ENDPOINTS:
+    return await wsgi_application(scope, receive, send)
+  environ = environ_for(scope, await read_body(receive))
+  async with async_session() as session:
+    status, headers, body = await session.run_sync(dispatch, environ)
+  await send({
+    'type': 'http.response.start',
+    'status': status,
+    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+  })
+  await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+  while True:
+    message = await receive()
+    if message['type'] == 'lifespan.startup':
+      await send({'type': 'lifespan.startup.complete'})
+    elif message['type'] == 'lifespan.shutdown':
+      await async_engine.dispose()
+      await send({'type': 'lifespan.shutdown.complete'})
+      return
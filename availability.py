@@ -0,0 +1,113 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, time, timedelta
+
+#----------------------------------------------------------------------------#
+# Booking availability.
+#
+# The database is the source of truth: the (venue_id, start_time, end_time)
+# and (artist_id, start_time, end_time) indexes on shows answer range
+# queries for one venue or artist, and book_show() in app.py locks both
+# sides before checking them. The helpers here work on the bookings such a
+# query returns: an interval index to check many new bookings against them
+# (and against each other) without a query per booking, and the free slots
+# left between them for the calendar.
+#
+# Bookings are closed intervals: a show ending at 22:00 conflicts with one
+# starting at 22:00, as in show_validation().
+#----------------------------------------------------------------------------#
+
+
+class IntervalIndex(object):
+  # Bookings of one venue or artist, kept sorted by start time. Anything
+  # touching [start, end] started at most `longest` before start, so a
+  # lookup only scans the bookings starting in [start - longest, end].
+
+  def __init__(self, bookings=()):
+    self.bookings = []
+    self.longest = timedelta(0)
+    for start, end, item in bookings:
+      self.add(start, end, item)
+
+  def __len__(self):
+    return len(self.bookings)
+
+  def __iter__(self):
+    return iter(self.bookings)
+
+  def add(self, start, end, item=None):
+    insort(self.bookings, (start, end, Key(item)))
+    self.longest = max(self.longest, end - start)
+
+  def overlapping(self, start, end):
+    # (start, end, item) of every booking touching [start, end], by start.
+    first = bisect_left(self.bookings, (start - self.longest,))
+    last = bisect_right(self.bookings, (end, datetime.max))
+    return [(booked_start, booked_end, key.item) for booked_start, booked_end, key in self.bookings[first:last]
+            if booked_end >= start]
+
+  def conflicts(self, start, end):
+    return bool(self.overlapping(start, end))
+
+
+class Key(object):
+  # Wraps the caller's item so that equal times never fall back to
+  # comparing items, which need not be orderable.
+  __slots__ = ('item',)
+
+  def __init__(self, item):
+    self.item = item
+
+  def __lt__(self, other):
+    return False
+
+
+class Calendar(object):
+  # An IntervalIndex per (kind, id) key, e.g. ('venue', 3) and ('artist', 7).
+
+  def __init__(self):
+    self.indexes = {}
+
+  def add(self, keys, start, end, item=None):
+    for key in keys:
+      self.indexes.setdefault(key, IntervalIndex()).add(start, end, item)
+
+  def conflicts(self, keys, start, end):
+    return any(key in self.indexes and self.indexes[key].conflicts(start, end) for key in keys)
+
+
+def free_slots(bookings, start, end, min_length=timedelta(0)):
+  # The (start, end) gaps of at least min_length in [start, end] left by
+  # (start, end) bookings sorted by start time.
+  slots = []
+  free_from = start
+  for booked_start, booked_end in bookings:
+    slot_end = min(booked_start, end)
+    if slot_end > free_from and slot_end - free_from >= min_length:
+      slots.append((free_from, slot_end))
+    free_from = max(free_from, booked_end)
+    if free_from >= end:
+      return slots
+  if end > free_from and end - free_from >= min_length:
+    slots.append((free_from, end))
+  return slots
+
+
+def day_range(day, days=1):
+  # [midnight of day, midnight `days` later) as datetimes.
+  start = datetime.combine(day, time.min)
+  return start, start + timedelta(days=days)
+
+
+def calendar_days(day, days, bookings, slots):
+  # One entry per date from day on: the bookings starting that day and the
+  # free slots, split at midnight, that fall on it.
+  entries = []
+  for offset in range(days):
+    start, end = day_range(day + timedelta(days=offset))
+    entries.append({
+      'date': start.date(),
+      'shows': [booking for booking in bookings if start <= booking['start_time'] < end],
+      'free': [(max(slot_start, start), min(slot_end, end)) for slot_start, slot_end in slots
+               if slot_start < end and slot_end > start],
+    })
+  return entries
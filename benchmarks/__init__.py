@@ -0,0 +1 @@
+# Benchmarks for Fyyur pages, run as modules e.g. `python -m benchmarks.detail_pages`.
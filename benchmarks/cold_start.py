@@ -0,0 +1,100 @@
+# Measures cold start: the time from launching a server process until it
+# has answered its first request, and how long that first request and the
+# first hit on a few other pages take. Compares the bare app against the
+# warmed wsgi entry point (templates compiled, pool connections opened),
+# and gunicorn with gunicorn.conf.py when gunicorn is installed. Uses
+# DATABASE_URL when set, otherwise a throwaway SQLite file.
+#
+#   python -m benchmarks.cold_start --runs 5
+
+import argparse
+import http.client
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'cold_start.db')
+
+from benchmarks.serving import free_port
+from benchmarks.seed import seed
+
+SERVERS = {
+    'app': [sys.executable, '-c', "from werkzeug.serving import run_simple; from app import app; "
+                                  "run_simple('127.0.0.1', {port}, app, threaded=True)"],
+    # run_simple has no post-fork hook, so the worker warm-up runs before serving.
+    'wsgi': [sys.executable, '-c', "from werkzeug.serving import run_simple; from wsgi import application, warm_worker; "
+                                   "warm_worker(); run_simple('127.0.0.1', {port}, application, threaded=True)"],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1', '--bind', '127.0.0.1:{port}'],
+}
+PATHS = ['/', '/venues', '/artists/1', '/shows']
+
+
+def get(port, path):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def run(name):
+    # (seconds to first response, [first request seconds per path])
+    port = free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [part.replace('{port}', str(port)) for part in SERVERS[name]]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError('{0} exited'.format(name))
+            try:
+                request_started = time.perf_counter()
+                get(port, PATHS[0])
+                break
+            except OSError:
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+        firsts = [time.perf_counter() - request_started]
+        for path in PATHS[1:]:
+            request_started = time.perf_counter()
+            get(port, path)
+            firsts.append(time.perf_counter() - request_started)
+        return ready, firsts
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start to first request.')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--servers', default='app,wsgi,gunicorn')
+    args = parser.parse_args()
+
+    from app import app, db
+    with app.app_context():
+        db.create_all()
+        seed('small')
+
+    names = [name for name in args.servers.split(',')
+             if name != 'gunicorn' or importlib.util.find_spec('gunicorn')]
+    print('{0:<10} {1:>14} '.format('server', 'first resp ms') +
+          ' '.join('{0:>12}'.format(path) for path in PATHS))
+    for name in names:
+        results = [run(name) for _ in range(args.runs)]
+        ready = min(result[0] for result in results)
+        firsts = [min(result[1][i] for result in results) for i in range(len(PATHS))]
+        print('{0:<10} {1:>14.1f} '.format(name, ready * 1000) +
+              ' '.join('{0:>12.1f}'.format(seconds * 1000) for seconds in firsts))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Measures the per-tile cost of the `datetime` Jinja filter by rendering
+# shows.html with 10k show tiles (a start and an end time each): the
+# previous filter, fed strings, against the cached filter fed datetimes,
+# with empty caches and again once they are warm.
+#
+#   python -m benchmarks.datetime_filter [shows]
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+import babel.dates
+import dateutil.parser
+from flask import render_template
+from app import app, format_datetime, formatted_datetime, datetime_pattern
+
+REPEAT = 3
+
+
+def previous_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "dd, MM, y EE h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def shows(count, as_string):
+    start = datetime(2030, 1, 1, 20, 0)
+    data = []
+    for i in range(count):
+        start_time = start + timedelta(hours=i)
+        end_time = start_time + timedelta(hours=2)
+        data.append({'venue_id': 1, 'venue_name': 'Venue', 'artist_id': 1, 'artist_name': 'Artist',
+                     'artist_image_link': '', 'start_time': str(start_time) if as_string else start_time,
+                     'end_time': str(end_time) if as_string else end_time})
+    return data
+
+
+def render(data, clear):
+    # best of REPEAT renders, in microseconds per tile
+    best = None
+    for _ in range(REPEAT):
+        if clear:
+            formatted_datetime.cache_clear()
+            datetime_pattern.cache_clear()
+        started = time.perf_counter()
+        render_template('pages/shows.html', shows=data, cursors={})
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(data) * 1000000
+
+
+def main(count):
+    with app.test_request_context('/shows'):
+        app.jinja_env.filters['datetime'] = previous_format_datetime
+        previous = render(shows(count, True), False)
+        app.jinja_env.filters['datetime'] = format_datetime
+        cold = render(shows(count, False), True)
+        warm = render(shows(count, False), False)
+    print('{0} show tiles'.format(count))
+    print('{0:<34} {1:>10}'.format('filter', 'us/tile'))
+    print('{0:<34} {1:>10.1f}'.format('previous (parse + babel)', previous))
+    print('{0:<34} {1:>10.1f}'.format('cached, cold', cold))
+    print('{0:<34} {1:>10.1f}'.format('cached, warm', warm))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
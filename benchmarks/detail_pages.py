@@ -0,0 +1,72 @@
+# Measures the cost of rendering an artist page as the artist's show
+# history grows. Uses DATABASE_URL when set, otherwise a throwaway SQLite file.
+#
+#   python -m benchmarks.detail_pages 1000 5000 20000
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import app, db, format_datetime, genres_from_names, Artist, Venue, Shows
+
+REPEAT = 20
+UPCOMING_SHOWS = 10
+
+
+def seed_artist(past_shows):
+    venue = Venue(name='Benchmark Venue', city='San Francisco', state='CA', genres=genres_from_names(['Jazz']))
+    artist = Artist(name='Benchmark Artist {0}'.format(past_shows), city='San Francisco', state='CA', genres=genres_from_names(['Jazz']))
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    now = datetime.now()
+    rows = []
+    for i in range(past_shows):
+        start_time = now - timedelta(days=i + 1)
+        rows.append({'venue_id': venue.id, 'artist_id': artist.id,
+                     'start_time': start_time, 'end_time': start_time + timedelta(hours=2)})
+    for i in range(UPCOMING_SHOWS):
+        start_time = now + timedelta(days=i + 1)
+        rows.append({'venue_id': venue.id, 'artist_id': artist.id,
+                     'start_time': start_time, 'end_time': start_time + timedelta(hours=2)})
+    db.session.execute(Shows.__table__.insert(), rows)
+    db.session.commit()
+    return artist.id
+
+
+def string_split(artist_id):
+    # The previous implementation: every row is formatted twice through
+    # Babel and compared as strings.
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    upcoming = 0
+    for show in Shows.query.filter_by(artist_id=artist_id):
+        if format_datetime(str(show.start_time)) > format_datetime(current_time):
+            upcoming += 1
+    return upcoming
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - started) / REPEAT * 1000
+
+
+def main(sizes):
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        print('{0:>8} {1:>14} {2:>18}'.format('shows', 'page ms', 'string split ms'))
+        for size in sizes:
+            artist_id = seed_artist(size)
+            page_ms = timed(client.get, '/artists/{0}'.format(artist_id))
+            split_ms = timed(string_split, artist_id)
+            print('{0:>8} {1:>14.2f} {2:>18.2f}'.format(size, page_ms, split_ms))
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [1000, 5000])
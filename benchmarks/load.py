@@ -0,0 +1,311 @@
+# Drives every route of app.py against a seeded catalogue and reports
+# latency percentiles, throughput and SQL statements per endpoint, compared
+# against a stored baseline. Uses DATABASE_URL when set, otherwise a
+# throwaway SQLite file.
+#
+#   python -m benchmarks.load --scale medium --driver client
+#   python -m benchmarks.load --scale large --driver http --concurrency 16 --requests 5000
+#   python -m benchmarks.load --save-baseline        # record benchmarks/baseline.json
+#
+# The client driver calls the app in-process through the Flask test client;
+# the http driver serves the app on a local threaded server (or --url) and
+# loads it from --concurrency threads over real sockets. Delete routes are
+# not exercised since they would eat the catalogue under measurement; every
+# other route is, and any left out are listed after the report.
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load.db')
+
+from benchmarks.seed import SCALES, seed, zipf_weights, pick
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def cases(venues, artists, rng):
+    # (endpoint, weight, method, path, body) generators; a body is form data
+    # when a dict and a JSON document otherwise. Ids are drawn with the same
+    # skew as the seeded shows, so popular pages are hit most.
+    venue_weights = zipf_weights(venues)
+    artist_weights = zipf_weights(artists)
+
+    def venue():
+        return pick(rng, venue_weights) + 1
+
+    def artist():
+        return pick(rng, artist_weights) + 1
+
+    def booking():
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 365), hours=rng.randint(0, 23))
+        return {'artist_id': artist(), 'venue_id': venue(),
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
+                'end_time': (start_time + timedelta(hours=2)).strftime('%Y-%m-%d %H:%M')}
+
+    def venue_form():
+        return {'name': 'Load Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Load St',
+                'phone': '555-000-0000', 'genres': 'Jazz', 'website': '', 'facebook_link': '',
+                'image_link': '', 'seeking_talent': 'y', 'seeking_description': ''}
+
+    def artist_form():
+        return {'name': 'Load Artist', 'city': 'Austin', 'state': 'TX', 'phone': '555-000-0000',
+                'genres': 'Jazz', 'website': '', 'facebook_link': '', 'image_link': '',
+                'seeking_venue': 'y', 'seeking_talent': 'y', 'seeking_description': ''}
+
+    def api_record(form):
+        # the API takes genres as a list and validates the links, which the forms leave blank
+        return dict(form, genres=['Jazz'], website='https://load.example.com',
+                    facebook_link='https://www.facebook.com/load', image_link='https://load.example.com/front.jpg')
+
+    def tour():
+        # three nights in a row for one artist, across venues
+        first = booking()
+        start_time = datetime.strptime(first['start_time'], '%Y-%m-%d %H:%M')
+        return [dict(first, venue_id=venue(),
+                     start_time=(start_time + timedelta(days=night)).strftime('%Y-%m-%d %H:%M'),
+                     end_time=(start_time + timedelta(days=night, hours=2)).strftime('%Y-%m-%d %H:%M'))
+                for night in range(3)]
+
+    def day():
+        return (datetime.now() + timedelta(days=rng.randint(0, 60))).strftime('%Y-%m-%d')
+
+    return [
+        ('index', 10, 'GET', lambda: '/', None),
+        ('venues', 10, 'GET', lambda: '/venues', None),
+        ('artists', 10, 'GET', lambda: '/artists', None),
+        ('shows', 10, 'GET', lambda: '/shows', None),
+        ('upcoming_shows', 10, 'GET', lambda: '/shows/upcoming', None),
+        ('show_venue', 20, 'GET', lambda: '/venues/{0}'.format(venue()), None),
+        ('show_artist', 20, 'GET', lambda: '/artists/{0}'.format(artist()), None),
+        ('search_venues', 8, 'POST', lambda: '/venues/search', lambda: {'search_term': rng.choice(['Blue', 'hall', 'ro', 'Golden Fox'])}),
+        ('search_artists', 8, 'POST', lambda: '/artists/search', lambda: {'search_term': rng.choice(['Band', 'sax', 'el', 'Wild Owl'])}),
+        ('venues_nearby', 5, 'GET', lambda: '/venues/nearby?lat={0}&lng={1}&radius={2}'.format(
+            *rng.choice([(40.71, -74.0), (34.05, -118.24), (41.88, -87.63)]), rng.choice([5, 25])), None),
+        ('venue_calendar', 5, 'GET', lambda: '/venues/{0}/calendar?start={1}'.format(venue(), day()), None),
+        ('available_artists', 5, 'GET', lambda: '/artists/available?date=' + day(), None),
+        ('api_autocomplete', 10, 'GET', lambda: '/api/autocomplete?' + urlencode({'q': rng.choice(['b', 'blu', 'gold', 'wild o', 'ha'])}), None),
+        ('export', 1, 'GET', lambda: '/export/{0}.{1}'.format(
+            rng.choice(['venues', 'artists', 'shows']), rng.choice(['csv', 'ndjson'])), None),
+        ('create_venue_form', 1, 'GET', lambda: '/venues/create', None),
+        ('create_artist_form', 1, 'GET', lambda: '/artists/create', None),
+        ('create_shows', 1, 'GET', lambda: '/shows/create', None),
+        ('edit_venue', 1, 'GET', lambda: '/venues/{0}/edit'.format(venue()), None),
+        ('edit_artist', 1, 'GET', lambda: '/artists/{0}/edit'.format(artist()), None),
+        ('create_venue_submission', 1, 'POST', lambda: '/venues/create', venue_form),
+        ('create_artist_submission', 1, 'POST', lambda: '/artists/create', artist_form),
+        ('create_show_submission', 2, 'POST', lambda: '/shows/create', booking),
+        ('edit_venue_submission', 1, 'POST', lambda: '/venues/{0}/edit'.format(venue()), venue_form),
+        ('edit_artist_submission', 1, 'POST', lambda: '/artists/{0}/edit'.format(artist()), artist_form),
+        ('api_create_venues', 1, 'POST', lambda: '/api/v1/venues', lambda: [api_record(venue_form())] * 5),
+        ('api_update_venues', 1, 'PATCH', lambda: '/api/v1/venues', lambda: [api_record({'id': venue()})]),
+        ('api_create_artists', 1, 'POST', lambda: '/api/v1/artists', lambda: [api_record(artist_form())] * 5),
+        ('api_update_artists', 1, 'PATCH', lambda: '/api/v1/artists', lambda: [api_record({'id': artist()})]),
+        ('api_create_shows_view', 1, 'POST', lambda: '/api/v1/shows', lambda: [booking() for _ in range(5)]),
+        ('api_book_tour_view', 1, 'POST', lambda: '/api/v1/tours', tour),
+        ('metrics', 1, 'GET', lambda: '/_metrics', None),
+    ]
+
+
+def plan(case_list, total, rng):
+    # A shuffled request list honouring the case weights, with every case at least once.
+    weights = list(zip(*case_list))[1]
+    chosen = list(case_list) + rng.choices(case_list, weights=weights, k=max(total - len(case_list), 0))
+    rng.shuffle(chosen)
+    return [(endpoint, method, path(), data() if data else None) for endpoint, weight, method, path, data in chosen]
+
+
+def encode(data):
+    # The request body and headers for a case's form data or JSON document.
+    if data is None:
+        return None, {}
+    if isinstance(data, dict):
+        return urlencode(data), {'Content-Type': 'application/x-www-form-urlencoded'}
+    return json.dumps(data), {'Content-Type': 'application/json'}
+
+
+def query_count(headers):
+    match = QUERIES.search(headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+def run_client(app, requests):
+    client = app.test_client()
+    samples = []
+    started = time.perf_counter()
+    for endpoint, method, path, data in requests:
+        request_started = time.perf_counter()
+        body, headers = encode(data)
+        response = client.open(path, method=method, data=body, headers=headers)
+        response.get_data()  # drain streamed responses such as the exports
+        samples.append((endpoint, time.perf_counter() - request_started, query_count(response.headers), response.status_code))
+    return samples, time.perf_counter() - started
+
+
+def run_http(base_url, requests, concurrency):
+    parts = urlsplit(base_url)
+    work = queue.Queue()
+    for request in requests:
+        work.put(request)
+    samples = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                endpoint, method, path, data = work.get_nowait()
+            except queue.Empty:
+                return
+            body, headers = encode(data)
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+            request_started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                sample = (endpoint, time.perf_counter() - request_started, query_count(response.headers), response.status)
+            except (OSError, http.client.HTTPException):
+                sample = (endpoint, time.perf_counter() - request_started, 0, 599)
+            finally:
+                connection.close()
+            with lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def serve(app):
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{0}'.format(server.server_port)
+
+
+def percentile(values, fraction):
+    # nearest-rank percentile of an already sorted list
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def summarize(samples, elapsed):
+    by_endpoint = {}
+    for endpoint, seconds, queries, status in samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, queries, status))
+    summary = {}
+    for endpoint, rows in by_endpoint.items():
+        latencies = sorted(seconds * 1000 for seconds, queries, status in rows)
+        summary[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for seconds, queries, status in rows if status >= 500),
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'rps': len(rows) / elapsed,
+            'queries': sum(queries for seconds, queries, status in rows) / float(len(rows)),
+        }
+    return summary
+
+
+def report(summary, elapsed, baseline, max_regression):
+    regressions = []
+    print('{0:<26} {1:>6} {2:>5} {3:>9} {4:>9} {5:>9} {6:>8} {7:>8} {8:>12}'.format(
+        'endpoint', 'n', 'err', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries', 'p95 vs base'))
+    for endpoint in sorted(summary):
+        stats = summary[endpoint]
+        against = ''
+        base = baseline.get(endpoint)
+        if base:
+            change = (stats['p95'] - base['p95']) / base['p95'] if base['p95'] else 0.0
+            against = '{0:+.0%}'.format(change)
+            if change > max_regression or stats['queries'] > base['queries'] + 0.5:
+                regressions.append(endpoint)
+                against += ' !'
+        print('{0:<26} {1:>6} {2:>5} {3:>9.2f} {4:>9.2f} {5:>9.2f} {6:>8.1f} {7:>8.1f} {8:>12}'.format(
+            endpoint, stats['requests'], stats['errors'], stats['p50'], stats['p95'], stats['p99'],
+            stats['rps'], stats['queries'], against))
+    total = sum(stats['requests'] for stats in summary.values())
+    print('{0} requests in {1:.2f}s, {2:.1f} req/s'.format(total, elapsed, total / elapsed))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test every Fyyur route.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--no-seed', action='store_true', help='use the data already in DATABASE_URL')
+    parser.add_argument('--driver', choices=['client', 'http'], default='client')
+    parser.add_argument('--url', help='load an already running server instead of starting one (http driver)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--random-seed', type=int, default=0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='fail when an endpoint p95 grows by more than this fraction of the baseline')
+    args = parser.parse_args()
+
+    from app import app, db, Venue, Artist
+    rng = random.Random(args.random_seed)
+    with app.app_context():
+        db.create_all()
+        if not args.no_seed:
+            seed(args.scale, args.random_seed)
+        venues, artists = Venue.query.count(), Artist.query.count()
+
+    case_list = cases(venues, artists, rng)
+    exercised = set(case[0] for case in case_list)
+    skipped = sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                     if rule.endpoint != 'static' and rule.endpoint not in exercised)
+    requests = plan(case_list, args.requests, rng)
+
+    if args.driver == 'client':
+        samples, elapsed = run_client(app, requests)
+    else:
+        server = None
+        base_url = args.url
+        if base_url is None:
+            server, base_url = serve(app)
+        try:
+            samples, elapsed = run_http(base_url, requests, args.concurrency)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    summary = summarize(samples, elapsed)
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = report(summary, elapsed, baseline, args.max_regression)
+    if skipped:
+        print('not exercised: ' + ', '.join(skipped))
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+        print('baseline written to ' + args.baseline)
+    elif regressions:
+        print('regressed against baseline: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
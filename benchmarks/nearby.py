@@ -0,0 +1,64 @@
+# Measures /venues/nearby lookups through the geohash index against
+# measuring the distance to every located venue, at a few radii around the
+# seeded cities. Uses DATABASE_URL when set, otherwise a throwaway SQLite
+# file.
+#
+#   python -m benchmarks.nearby --scale large
+
+import argparse
+import os
+import tempfile
+import time
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'nearby.db')
+
+from benchmarks.seed import SCALES, CITIES, CITY_STATES, seed
+from geo import read_gazetteer, distance_km
+
+REPEAT = 20
+RADII = [5, 25, 100]
+
+
+def full_scan(db, Venue, latitude, longitude, radius):
+    venues = db.session.query(Venue.id, Venue.latitude, Venue.longitude).filter(Venue.latitude.isnot(None))
+    found = [(distance_km(latitude, longitude, venue.latitude, venue.longitude), venue.id) for venue in venues]
+    return sorted(match for match in found if match[0] <= radius)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func(*args)
+    return (time.perf_counter() - started) / REPEAT * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare geohash and full-scan radius searches.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='medium')
+    args = parser.parse_args()
+
+    from app import app, db, Venue, nearby_venues
+    places = read_gazetteer()
+    centres = [places[(city.casefold(), state)] for city, state in zip(CITIES[:3], CITY_STATES[:3])]
+    with app.app_context():
+        db.create_all()
+        venues, artists, shows = seed(args.scale)
+        print('{0} venues'.format(venues))
+        print('{0:>8} {1:>8} {2:>12} {3:>14}'.format('radius', 'found', 'geohash ms', 'full scan ms'))
+        for radius in RADII:
+            indexed_ms = scan_ms = 0
+            found = 0
+            for latitude, longitude in centres:
+                ms, result = timed(nearby_venues, latitude, longitude, radius, venues)
+                indexed_ms += ms
+                found += len(result)
+                ms, expected = timed(full_scan, db, Venue, latitude, longitude, radius)
+                scan_ms += ms
+                assert [venue.id for distance, venue in result] == [id for distance, id in expected]
+            print('{0:>8} {1:>8} {2:>12.2f} {3:>14.2f}'.format(
+                radius, found // len(centres), indexed_ms / len(centres), scan_ms / len(centres)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Synthetic catalogue generator. Venue and artist popularity follows a
+# Zipf-like distribution, so a few venues and artists carry most of the shows
+# the way real catalogues do, and venues cluster in a few large cities.
+# Shows spread over the past two years and the coming year. Venues are
+# scattered up to about 20 km around their city's gazetteer position.
+#
+#   python -m benchmarks.seed --scale medium
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from bisect import bisect
+
+from forms import Genre
+from geo import read_gazetteer, encode
+
+# name: (venues, artists, shows)
+SCALES = {
+    'small': (50, 100, 1000),
+    'medium': (500, 1000, 10000),
+    'large': (5000, 10000, 100000),
+    'huge': (50000, 100000, 1000000),
+}
+
+CHUNK = 5000
+CITIES = ['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix', 'Philadelphia',
+          'San Antonio', 'San Diego', 'Dallas', 'San Francisco', 'Austin', 'Seattle',
+          'Denver', 'Nashville', 'Portland', 'Las Vegas', 'Memphis', 'Detroit']
+CITY_STATES = ['NY', 'CA', 'IL', 'TX', 'AZ', 'PA', 'TX', 'CA', 'TX', 'CA', 'TX', 'WA',
+               'CO', 'TN', 'OR', 'NV', 'TN', 'MI']
+SCATTER_DEGREES = 0.18
+WORDS = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Sax',
+         'Petals', 'Guns', 'Lounge', 'Hall', 'Room', 'Club', 'Band', 'Collective', 'Echo',
+         'Tide', 'Harbor', 'Garden', 'Rocket', 'Static', 'Owl', 'Fox', 'Crown', 'Union']
+
+
+def zipf_weights(count, exponent=1.1):
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def pick(rng, cumulative):
+    # index drawn according to cumulative weights
+    return bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def name(rng, index):
+    return '{0} {1} {2}'.format(rng.choice(WORDS), rng.choice(WORDS), index)
+
+
+def genre_links(rng, key, first_id, count, genre_ids):
+    # one to three genres per row, as association table rows
+    return [{key: first_id + i, 'genre_id': genre_id}
+            for i in range(count) for genre_id in rng.sample(genre_ids, rng.randint(1, 3))]
+
+
+def insert(db, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[start:start + CHUNK])
+
+
+def seed(scale='small', random_seed=0):
+    # Inserts a catalogue of the given scale into the app's database and
+    # returns the (venues, artists, shows) counts.
+    from app import db, Venue, Artist, Shows, venue_genres, artist_genres, genres_from_names, recount_upcoming_shows, rebuild_upcoming_feed
+
+    venues, artists, shows = SCALES[scale] if isinstance(scale, str) else scale
+    rng = random.Random(random_seed)
+    genres = genres_from_names([genre.value for genre in Genre])
+    db.session.flush()
+    genre_ids = sorted(genre.id for genre in genres)
+    places = read_gazetteer()
+    city_weights = zipf_weights(len(CITIES))
+    venue_rows = []
+    for i in range(venues):
+        city = pick(rng, city_weights)
+        latitude, longitude = places[(CITIES[city].casefold(), CITY_STATES[city])]
+        latitude += rng.uniform(-SCATTER_DEGREES, SCATTER_DEGREES)
+        longitude += rng.uniform(-SCATTER_DEGREES, SCATTER_DEGREES)
+        venue_rows.append({
+            'name': name(rng, i), 'city': CITIES[city], 'state': CITY_STATES[city],
+            'address': '{0} Main St'.format(i), 'phone': '555-000-{0:04d}'.format(i % 10000),
+            'image_link': 'https://example.com/venue/{0}.jpg'.format(i),
+            'latitude': latitude, 'longitude': longitude, 'geohash': encode(latitude, longitude)})
+    insert(db, Venue.__table__, venue_rows)
+    artist_rows = []
+    for i in range(artists):
+        city = pick(rng, city_weights)
+        artist_rows.append({
+            'name': name(rng, i), 'city': CITIES[city], 'state': CITY_STATES[city],
+            'phone': '555-100-{0:04d}'.format(i % 10000),
+            'image_link': 'https://example.com/artist/{0}.jpg'.format(i)})
+    insert(db, Artist.__table__, artist_rows)
+    first_venue = db.session.query(db.func.min(Venue.id)).scalar()
+    first_artist = db.session.query(db.func.min(Artist.id)).scalar()
+    insert(db, venue_genres, genre_links(rng, 'venue_id', first_venue, venues, genre_ids))
+    insert(db, artist_genres, genre_links(rng, 'artist_id', first_artist, artists, genre_ids))
+    venue_weights = zipf_weights(venues)
+    artist_weights = zipf_weights(artists)
+    now = datetime.now().replace(second=0, microsecond=0)
+    show_rows = []
+    for i in range(shows):
+        start_time = now + timedelta(hours=rng.randint(-2 * 365 * 24, 365 * 24))
+        show_rows.append({
+            'venue_id': first_venue + pick(rng, venue_weights),
+            'artist_id': first_artist + pick(rng, artist_weights),
+            'start_time': start_time, 'end_time': start_time + timedelta(hours=rng.randint(1, 4))})
+        if len(show_rows) == CHUNK:
+            insert(db, Shows.__table__, show_rows)
+            show_rows = []
+    insert(db, Shows.__table__, show_rows)
+    recount_upcoming_shows(Venue)
+    recount_upcoming_shows(Artist)
+    rebuild_upcoming_feed()
+    db.session.commit()
+    return venues, artists, shows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed the configured database with a synthetic catalogue.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--random-seed', type=int, default=0)
+    args = parser.parse_args()
+    from app import app, db
+    with app.app_context():
+        db.create_all()
+        print('seeded {0} venues, {1} artists, {2} shows'.format(*seed(args.scale, args.random_seed)))
+
+
+if __name__ == '__main__':
+    main()
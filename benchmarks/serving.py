@@ -0,0 +1,128 @@
+# Compares the sync WSGI and the ASGI (asgi.py) serving paths on the
+# read-heavy pages, with some clients that trickle their requests in slowly
+# the whole time, as clients on bad networks do. Each server runs as one
+# process against the same seeded catalogue. Uses DATABASE_URL when set,
+# otherwise a throwaway SQLite file; needs uvicorn for the asgi server.
+#
+#   python -m benchmarks.serving --slow-clients 50 --concurrency 32
+#
+# wsgi is the Werkzeug server app.run() starts (a thread per request),
+# wsgi-single serves one request at a time like a sync gunicorn worker, and
+# asgi is uvicorn with a single worker.
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'serving.db')
+
+from benchmarks.load import cases, plan, run_http, percentile
+from benchmarks.seed import SCALES, seed
+
+WSGI_SERVER = ("from werkzeug.serving import run_simple; from app import app; "
+               "run_simple('127.0.0.1', {port}, app, threaded={threaded})")
+SERVERS = {
+    'wsgi': [sys.executable, '-c', WSGI_SERVER.replace('{threaded}', 'True')],
+    'wsgi-single': [sys.executable, '-c', WSGI_SERVER.replace('{threaded}', 'False')],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', '{port}', '--log-level', 'warning'],
+}
+READ_ENDPOINTS = ['index', 'venues', 'artists', 'shows', 'show_venue', 'show_artist', 'search_venues', 'search_artists']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(name, port):
+    command = [part.replace('{port}', str(port)) for part in SERVERS[name]]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(command, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    while time.perf_counter() - started < 30:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('{0} did not start'.format(name))
+
+
+def slow_client(port, stop, seconds):
+    # Sends each request over `seconds`, a few bytes at a time, reads the
+    # response and starts over until stopped.
+    request = b'GET /venues HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'
+    pieces = [request[i:i + 4] for i in range(0, len(request), 4)]
+    while not stop.is_set():
+        try:
+            connection = socket.create_connection(('127.0.0.1', port), timeout=60)
+            try:
+                for piece in pieces:
+                    connection.sendall(piece)
+                    stop.wait(seconds / len(pieces))
+                while connection.recv(65536):
+                    pass
+            finally:
+                connection.close()
+        except OSError:
+            stop.wait(0.1)
+
+
+def measure(name, requests, concurrency, slow_clients, slow_seconds):
+    port = free_port()
+    process = start(name, port)
+    stop = threading.Event()
+    slow = [threading.Thread(target=slow_client, args=(port, stop, slow_seconds), daemon=True) for _ in range(slow_clients)]
+    try:
+        for thread in slow:
+            thread.start()
+        time.sleep(0.5)
+        samples, elapsed = run_http('http://127.0.0.1:{0}'.format(port), requests, concurrency)
+    finally:
+        stop.set()
+        process.terminate()
+        process.wait()
+    latencies = sorted(seconds * 1000 for endpoint, seconds, queries, status in samples)
+    errors = sum(1 for endpoint, seconds, queries, status in samples if status >= 500)
+    return len(samples) / elapsed, percentile(latencies, 0.50), percentile(latencies, 0.95), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the WSGI and ASGI serving paths.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--servers', default='wsgi,asgi', help='any of wsgi, wsgi-single, asgi')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--slow-clients', type=int, default=20)
+    parser.add_argument('--slow-seconds', type=float, default=2.0, help='time a slow client takes to send a request')
+    parser.add_argument('--random-seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import app, db, Venue, Artist
+    with app.app_context():
+        db.create_all()
+        seed(args.scale, args.random_seed)
+        venues, artists = Venue.query.count(), Artist.query.count()
+    rng = random.Random(args.random_seed)
+    case_list = [case for case in cases(venues, artists, rng) if case[0] in READ_ENDPOINTS]
+    requests = plan(case_list, args.requests, rng)
+
+    print('{0} requests, {1} concurrent clients, {2} slow clients taking {3}s per request'.format(
+        len(requests), args.concurrency, args.slow_clients, args.slow_seconds))
+    print('{0:<12} {1:>8} {2:>9} {3:>9} {4:>6}'.format('server', 'req/s', 'p50 ms', 'p95 ms', 'err'))
+    for name in args.servers.split(','):
+        rps, p50, p95, errors = measure(name, requests, args.concurrency, args.slow_clients, args.slow_seconds)
+        print('{0:<12} {1:>8.1f} {2:>9.2f} {3:>9.2f} {4:>6}'.format(name, rps, p50, p95, errors))
+
+
+if __name__ == '__main__':
+    main()
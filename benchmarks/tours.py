@@ -0,0 +1,77 @@
+# Compares booking a tour one /shows/create POST per show against a single
+# POST to /api/v1/tours, on a seeded catalogue. Uses DATABASE_URL when set,
+# otherwise a throwaway SQLite file.
+#
+#   python -m benchmarks.tours --scale medium --shows 12 48
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'tours.db')
+
+from sqlalchemy import event
+
+from benchmarks.seed import SCALES, seed
+
+TOURS = 5
+
+
+def tour(artist_id, venues, shows, first_day):
+    # one show a night at successive venues, far enough out to be free
+    start = datetime.combine(first_day, datetime.min.time()) + timedelta(hours=20)
+    return [{'artist_id': artist_id, 'venue_id': venues[i % len(venues)],
+             'start_time': str(start + timedelta(days=i)), 'end_time': str(start + timedelta(days=i, hours=2))}
+            for i in range(shows)]
+
+
+def one_at_a_time(client, shows):
+    for show in shows:
+        client.post('/shows/create', data=show)
+
+
+def batched(client, shows):
+    response = client.post('/api/v1/tours', data=json.dumps(shows), content_type='application/json')
+    assert response.status_code == 200, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-show and batched tour booking.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--shows', type=int, nargs='+', default=[12, 48])
+    args = parser.parse_args()
+
+    from app import app, db, Shows
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        venues, artists, shows = seed(args.scale)
+        queries = [0]
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.__setitem__(0, queries[0] + 1))
+    client = app.test_client()
+    first_day = datetime.now().date() + timedelta(days=3650)
+    artist_id = 0
+    print('{0:>6} {1:<14} {2:>10} {3:>14} {4:>8}'.format('shows', 'booking', 'ms/tour', 'queries/tour', 'booked'))
+    for size in args.shows:
+        for name, book in (('one at a time', one_at_a_time), ('tour endpoint', batched)):
+            with app.app_context():
+                before = Shows.query.count()
+            queries[0] = 0
+            started = time.perf_counter()
+            for _ in range(TOURS):
+                artist_id = artist_id % artists + 1
+                book(client, tour(artist_id, list(range(1, venues + 1)), size, first_day))
+                first_day += timedelta(days=size)
+            elapsed = time.perf_counter() - started
+            with app.app_context():
+                booked = Shows.query.count() - before
+            print('{0:>6} {1:<14} {2:>10.1f} {3:>14.1f} {4:>8}'.format(
+                size, name, elapsed / TOURS * 1000, queries[0] / TOURS, booked))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import json
+from itertools import islice
+from werkzeug.datastructures import MultiDict
+
+#----------------------------------------------------------------------------#
+# Bulk record helpers for the /api/v1 endpoints.
+#
+# Request bodies are either a JSON array of records or NDJSON (one record per
+# line). Records are read lazily and handled a chunk at a time, so an NDJSON
+# upload never has to fit in memory all at once; each chunk is validated and
+# then written with one executemany-style statement per table.
+#----------------------------------------------------------------------------#
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+
+class BadRecords(ValueError):
+  # The body could not be read as records at all.
+  pass
+
+
+def read_records(stream, content_type):
+  # Yields the records of a request body as dicts.
+  if content_type.split(';')[0].strip() in NDJSON_TYPES:
+    for number, line in enumerate(stream, 1):
+      line = line.strip()
+      if not line:
+        continue
+      try:
+        record = json.loads(line)
+      except ValueError as e:
+        raise BadRecords('line {0}: {1}'.format(number, e))
+      if not isinstance(record, dict):
+        raise BadRecords('line {0}: expected a JSON object'.format(number))
+      yield record
+    return
+  try:
+    records = json.load(stream)
+  except ValueError as e:
+    raise BadRecords(str(e))
+  if isinstance(records, dict):
+    records = [records]
+  if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+    raise BadRecords('expected a JSON array of objects')
+  for record in records:
+    yield record
+
+
+def chunked(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+
+def form_data(record):
+  # A JSON record as the form data WTForms expects: lists become repeated
+  # keys, true becomes 'y' and false or null leaves the field out.
+  data = MultiDict()
+  for key, value in record.items():
+    if value is None or value is False:
+      continue
+    if value is True:
+      value = 'y'
+    if isinstance(value, list):
+      for item in value:
+        data.add(key, str(item))
+    else:
+      data.add(key, str(value))
+  return data
+
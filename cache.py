@@ -0,0 +1,206 @@
+import hashlib
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+#----------------------------------------------------------------------------#
+# View data cache.
+#
+# Listing pages cache the data they render, keyed by URL. Each cached entry
+# belongs to one or more namespaces ('venues', 'artists', 'shows'), and every
+# namespace has a generation stored in the backend apart from the entries,
+# where neither the LRU bound nor a sweep can drop it: a generation that
+# went back to an earlier value would make the entries built on that value
+# reachable again. Writes bump the generation of the namespaces they touch,
+# which makes every older entry unreachable at once; unreachable entries
+# age out through the LRU bound, their TTL or the sweep.
+#----------------------------------------------------------------------------#
+
+class NullCache(object):
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value):
+    pass
+
+  def bump(self, key):
+    return 0
+
+  def generation(self, key):
+    return 0
+
+
+class MemoryCache(object):
+  # Bounded LRU with a per-entry TTL, private to one process. Use it with a
+  # single worker, or accept other workers serving stale data for up to TTL.
+
+  def __init__(self, max_entries=1024, ttl=300):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.generations = {}
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      expires, value = entry
+      if expires < time.time():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self.lock:
+      self.entries[key] = (time.time() + self.ttl, value)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def bump(self, key):
+    # one counter per namespace, outside the LRU so it is never evicted
+    with self.lock:
+      value = self.generations.get(key, 0) + 1
+      self.generations[key] = value
+      return value
+
+  def generation(self, key):
+    with self.lock:
+      return self.generations.get(key, 0)
+
+
+class FileSystemCache(object):
+  # One pickle file per entry in a directory shared by every worker on the
+  # host, so a write handled by one gunicorn worker invalidates the pages
+  # cached by the others. Generations live in their own subdirectory, which
+  # sweep() leaves alone.
+  #
+  # Entries are deleted when a read finds them expired, and about one set()
+  # in SWEEP_EVERY also sweeps the directory: files past their TTL go first,
+  # then the least recently written down to max_entries. `flask sweep-cache`
+  # runs the same sweep from cron.
+
+  SWEEP_EVERY = 100
+
+  def __init__(self, directory, ttl=300, max_entries=1024):
+    self.directory = directory
+    self.generation_directory = os.path.join(directory, 'generations')
+    self.ttl = ttl
+    self.max_entries = max_entries
+    os.makedirs(self.generation_directory, exist_ok=True)
+
+  def path(self, key, directory=None):
+    return os.path.join(directory or self.directory, hashlib.sha1(repr(key).encode()).hexdigest())
+
+  def read(self, path):
+    try:
+      with open(path, 'rb') as f:
+        return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+      return None
+
+  def write(self, path, value):
+    # write then rename, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(dir=self.directory)
+    with os.fdopen(fd, 'wb') as f:
+      pickle.dump(value, f)
+    os.replace(temp_path, path)
+
+  def remove(self, path):
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+
+  def get(self, key):
+    path = self.path(key)
+    entry = self.read(path)
+    if entry is None:
+      return None
+    if entry[0] < time.time():
+      self.remove(path)
+      return None
+    return entry[1]
+
+  def set(self, key, value):
+    self.write(self.path(key), (time.time() + self.ttl, value))
+    if random.randrange(self.SWEEP_EVERY) == 0:
+      self.sweep()
+
+  def sweep(self):
+    # Number of files removed. A file's mtime is when it was written, so
+    # it expired ttl seconds later; this also catches the temporary files
+    # of writers that died before renaming them.
+    expired_before = time.time() - self.ttl
+    files = []
+    with os.scandir(self.directory) as entries:
+      for entry in entries:
+        try:
+          if entry.is_file():
+            files.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+          pass
+    files.sort(reverse=True)
+    removed = 0
+    for position, (written, path) in enumerate(files):
+      if written < expired_before or position >= self.max_entries:
+        self.remove(path)
+        removed += 1
+    return removed
+
+  def bump(self, key):
+    # A random token rather than a counter: two workers bumping at the same
+    # time must still each leave a generation no cached entry was built on.
+    value = os.urandom(8).hex()
+    self.write(self.path(key, self.generation_directory), value)
+    return value
+
+  def generation(self, key):
+    value = self.read(self.path(key, self.generation_directory))
+    return value if value is not None else 0
+
+
+class ViewCache(object):
+
+  def __init__(self, backend):
+    self.backend = backend
+
+  def get_or_set(self, namespaces, key, load, fresh_for=0):
+    # fresh_for: when a namespace was invalidated less than this many seconds
+    # ago, a freshly loaded value is returned but not stored, since it may
+    # have been read from a replica that has not caught up with the write.
+    generations = tuple(self.backend.generation(namespace) for namespace in namespaces)
+    full_key = (key, namespaces, generations)
+    value = self.backend.get(full_key)
+    if value is None:
+      value = load()
+      if not fresh_for or not self.invalidated_within(namespaces, fresh_for):
+        self.backend.set(full_key, value)
+    return value
+
+  def invalidated_within(self, namespaces, seconds):
+    since = time.time() - seconds
+    return any((self.backend.get(('invalidated', namespace)) or 0) > since for namespace in namespaces)
+
+  def invalidate(self, *namespaces):
+    for namespace in namespaces:
+      self.backend.bump(namespace)
+      self.backend.set(('invalidated', namespace), time.time())
+
+
+def view_cache_from_config(config):
+  cache_type = config.get('CACHE_TYPE', 'memory')
+  ttl = config.get('CACHE_TTL', 300)
+  if cache_type == 'memory':
+    return ViewCache(MemoryCache(config.get('CACHE_MAX_ENTRIES', 1024), ttl))
+  if cache_type == 'filesystem':
+    return ViewCache(FileSystemCache(config['CACHE_DIR'], ttl, config.get('CACHE_MAX_ENTRIES', 1024)))
+  return ViewCache(NullCache())
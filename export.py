@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import date
+
+#----------------------------------------------------------------------------#
+# Catalogue export formats.
+#
+# Rows arrive one at a time from a yield_per() query and leave as text one
+# line at a time, so an export of any size streams in constant memory.
+# Genres are written as a list in NDJSON and comma-joined in CSV, the form
+# the importer reads back.
+#----------------------------------------------------------------------------#
+
+EXPORT_COLUMNS = {
+  'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'website', 'facebook_link',
+             'image_link', 'seeking_talent', 'seeking_description', 'genres'],
+  'artists': ['id', 'name', 'city', 'state', 'phone', 'website', 'facebook_link',
+              'image_link', 'seeking_venue', 'seeking_description', 'genres'],
+  'shows': ['id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'start_time', 'end_time'],
+}
+
+EXPORT_MIMETYPES = {
+  'csv': 'text/csv',
+  'ndjson': 'application/x-ndjson',
+}
+
+
+def json_default(value):
+  if isinstance(value, date):
+    return value.isoformat()
+  raise TypeError(repr(value))
+
+
+def csv_value(value):
+  if value is None:
+    return ''
+  if isinstance(value, list):
+    return ','.join(value)
+  if isinstance(value, date):
+    return value.isoformat()
+  return value
+
+
+def csv_lines(columns, rows):
+  # A header line, then one line per row; the writer's buffer is emptied
+  # after every line.
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(columns)
+  yield buffer.getvalue()
+  for row in rows:
+    buffer.seek(0)
+    buffer.truncate()
+    writer.writerow([csv_value(row.get(column)) for column in columns])
+    yield buffer.getvalue()
+
+
+def ndjson_lines(columns, rows):
+  for row in rows:
+    yield json.dumps(dict((column, row.get(column)) for column in columns), default=json_default) + '\n'
+
+
+def export_lines(format, kind, rows):
+  lines = csv_lines if format == 'csv' else ndjson_lines
+  return lines(EXPORT_COLUMNS[kind], rows)
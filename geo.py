@@ -0,0 +1,115 @@
+import csv
+import math
+import os
+
+#----------------------------------------------------------------------------#
+# Venue locations.
+#
+# Venues are geocoded offline from gazetteer.csv, a bundled table of city
+# centres, by their city and state; no request ever calls out to a
+# geocoding service. Each located venue also stores the geohash of its
+# position. Geohashes of nearby points share prefixes, so the venues in a
+# geohash cell are one range scan of the ordinary index on venue.geohash,
+# on SQLite and PostgreSQL alike. A radius search reads the few cells
+# covering the circle's bounding box before measuring exact distances.
+#----------------------------------------------------------------------------#
+
+GAZETTEER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_CELLS = 16
+
+
+def place_key(city, state):
+  return (' '.join((city or '').split()).casefold(), (state or '').strip().upper())
+
+
+def read_gazetteer(path=GAZETTEER):
+  # {(city, state): (latitude, longitude)}
+  places = {}
+  with open(path, newline='') as f:
+    for row in csv.DictReader(f):
+      places[place_key(row['city'], row['state'])] = (float(row['latitude']), float(row['longitude']))
+  return places
+
+
+def locate(places, city, state):
+  # (latitude, longitude, geohash) of the city, or Nones when it isn't in
+  # the gazetteer.
+  position = places.get(place_key(city, state))
+  if position is None:
+    return None, None, None
+  return position[0], position[1], encode(position[0], position[1])
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+  bounds = [[-90.0, 90.0], [-180.0, 180.0]]
+  value = [latitude, longitude]
+  chars = []
+  bit, bits, axis = 0, 0, 1
+  while len(chars) < precision:
+    low, high = bounds[axis]
+    middle = (low + high) / 2
+    if value[axis] >= middle:
+      bits = bits * 2 + 1
+      bounds[axis][0] = middle
+    else:
+      bits = bits * 2
+      bounds[axis][1] = middle
+    axis = 1 - axis
+    bit += 1
+    if bit == 5:
+      chars.append(BASE32[bits])
+      bit, bits = 0, 0
+  return ''.join(chars)
+
+
+def cell_size(precision):
+  # (height, width) in degrees of a geohash cell; longitude takes the odd bits.
+  bits = precision * 5
+  return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+  # Great-circle (haversine) distance.
+  phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+  half_dphi = (other_phi - phi) / 2
+  half_dlambda = math.radians(other_longitude - longitude) / 2
+  a = math.sin(half_dphi) ** 2 + math.cos(phi) * math.cos(other_phi) * math.sin(half_dlambda) ** 2
+  return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=MAX_CELLS):
+  # Geohash prefixes whose cells together hold every point within
+  # radius_km: the cells overlapping the circle's bounding box, at the
+  # finest precision that needs no more than max_cells of them. ['']
+  # (everywhere) when even the coarsest cells would need more.
+  dlat = radius_km / KM_PER_DEGREE
+  south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+  shrink = math.cos(math.radians(max(abs(south), abs(north))))
+  dlng = 180.0 if shrink * 180.0 <= dlat else min(dlat / shrink, 180.0)
+  for precision in range(GEOHASH_PRECISION, 0, -1):
+    height, width = cell_size(precision)
+    rows = int(math.floor((north + 90.0) / height)) - int(math.floor((south + 90.0) / height)) + 1
+    columns = min(int(math.floor((longitude + dlng + 180.0) / width)) - int(math.floor((longitude - dlng + 180.0) / width)) + 1,
+                  int(round(360.0 / width)))
+    if rows * columns <= max_cells:
+      break
+  else:
+    return ['']
+  cells = set()
+  first_row = math.floor((south + 90.0) / height)
+  first_column = math.floor((longitude - dlng + 180.0) / width)
+  for row in range(rows):
+    cell_latitude = min(-90.0 + (first_row + row + 0.5) * height, 90.0)
+    for column in range(columns):
+      cell_longitude = (first_column + column + 0.5) * width % 360.0 - 180.0
+      cells.add(encode(cell_latitude, cell_longitude, precision))
+  return sorted(cells)
+
+
+def prefix_end(prefix):
+  # The smallest string above every geohash starting with prefix.
+  return prefix + '~'
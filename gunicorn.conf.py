@@ -0,0 +1,20 @@
+# gunicorn settings for serving wsgi:application. Each worker holds up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW database connections, so size the workers
+# against the database's (or pgbouncer's) connection limit.
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+# Import the app and compile templates once in the master; workers fork
+# with them already loaded.
+preload_app = True
+
+
+def post_fork(server, worker):
+    from wsgi import warm_worker
+    warm_worker()
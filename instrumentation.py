@@ -0,0 +1,139 @@
+import threading
+
+#----------------------------------------------------------------------------#
+# Per-endpoint request metrics.
+#
+# app.py times every request, every SQL statement and every template render
+# and hands the per-request totals to EndpointMetrics.record(), which keeps
+# running sums per endpoint for the /_metrics page.
+#----------------------------------------------------------------------------#
+
+SLOWEST_KEPT = 5
+
+
+class EndpointMetrics(object):
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.endpoints = {}
+
+  def record(self, endpoint, seconds, queries, db_seconds, render_seconds, slowest):
+    # slowest is a list of (seconds, statement) for the request's slowest queries
+    with self.lock:
+      stats = self.endpoints.setdefault(endpoint, {
+        'requests': 0,
+        'seconds': 0.0,
+        'queries': 0,
+        'db_seconds': 0.0,
+        'render_seconds': 0.0,
+        'slowest': [],
+      })
+      stats['requests'] += 1
+      stats['seconds'] += seconds
+      stats['queries'] += queries
+      stats['db_seconds'] += db_seconds
+      stats['render_seconds'] += render_seconds
+      by_statement = {}
+      for query_seconds, statement in stats['slowest'] + slowest:
+        statement = ' '.join(statement.split())[:200]
+        by_statement[statement] = max(query_seconds, by_statement.get(statement, 0.0))
+      stats['slowest'] = sorted(((query_seconds, statement) for statement, query_seconds in by_statement.items()), reverse=True)[:SLOWEST_KEPT]
+
+  def reset(self):
+    with self.lock:
+      self.endpoints = {}
+
+  def snapshot(self):
+    with self.lock:
+      return {endpoint: dict(stats, slowest=list(stats['slowest']))
+              for endpoint, stats in self.endpoints.items()}
+
+
+def escape_label(value):
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def prometheus_text(metrics):
+  # Renders a snapshot in the Prometheus text exposition format.
+  snapshot = metrics.snapshot()
+  families = [
+    ('fyyur_requests_total', 'Requests served.', 'counter', 'requests'),
+    ('fyyur_request_seconds_total', 'Time spent serving requests.', 'counter', 'seconds'),
+    ('fyyur_db_queries_total', 'SQL statements executed.', 'counter', 'queries'),
+    ('fyyur_db_seconds_total', 'Time spent executing SQL statements.', 'counter', 'db_seconds'),
+    ('fyyur_render_seconds_total', 'Time spent rendering templates.', 'counter', 'render_seconds'),
+  ]
+  lines = []
+  for name, help, type, key in families:
+    lines.append('# HELP {0} {1}'.format(name, help))
+    lines.append('# TYPE {0} {1}'.format(name, type))
+    for endpoint in sorted(snapshot):
+      lines.append('{0}{{endpoint="{1}"}} {2}'.format(name, escape_label(endpoint), snapshot[endpoint][key]))
+  lines.append('# HELP fyyur_db_slowest_query_seconds Slowest SQL statements seen per endpoint.')
+  lines.append('# TYPE fyyur_db_slowest_query_seconds gauge')
+  for endpoint in sorted(snapshot):
+    for seconds, statement in snapshot[endpoint]['slowest']:
+      lines.append('fyyur_db_slowest_query_seconds{{endpoint="{0}",statement="{1}"}} {2}'.format(
+        escape_label(endpoint), escape_label(statement), seconds))
+  return '\n'.join(lines) + '\n'
+
+
+#----------------------------------------------------------------------------#
+# Connection pool metrics.
+#
+# Pool events count connections opened, checkouts and invalidations; the
+# current occupancy is read from the pool itself when /_metrics is scraped.
+# Overflow connections in steady use mean workers outgrow the pool (raise
+# DB_POOL_SIZE); idle checked-in connections mean it holds more than the
+# workers need (lower it).
+#----------------------------------------------------------------------------#
+
+class PoolMetrics(object):
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.counters = {'connects': 0, 'checkouts': 0, 'invalidations': 0}
+
+  def add(self, counter, amount=1):
+    with self.lock:
+      self.counters[counter] += amount
+
+  def snapshot(self):
+    with self.lock:
+      return dict(self.counters)
+
+
+def pool_status(pool):
+  # Occupancy of a QueuePool; other pool classes only report checked out
+  # connections, when they track them at all.
+  status = {}
+  for key in ('size', 'checkedin', 'checkedout', 'overflow'):
+    method = getattr(pool, key, None)
+    if method is not None:
+      try:
+        status[key] = method()
+      except NotImplementedError:
+        pass
+  return status
+
+
+def pool_prometheus_text(metrics, pool):
+  counters = metrics.snapshot()
+  status = pool_status(pool)
+  families = [
+    ('fyyur_db_pool_connects_total', 'Database connections opened.', 'counter', counters['connects']),
+    ('fyyur_db_pool_checkouts_total', 'Connections checked out of the pool.', 'counter', counters['checkouts']),
+    ('fyyur_db_pool_invalidations_total', 'Connections discarded as broken.', 'counter', counters['invalidations']),
+    ('fyyur_db_pool_size', 'Connections the pool keeps open.', 'gauge', status.get('size')),
+    ('fyyur_db_pool_checked_in', 'Idle connections in the pool.', 'gauge', status.get('checkedin')),
+    ('fyyur_db_pool_checked_out', 'Connections in use.', 'gauge', status.get('checkedout')),
+    ('fyyur_db_pool_overflow', 'Connections open beyond the pool size.', 'gauge', status.get('overflow')),
+  ]
+  lines = []
+  for name, help, type, value in families:
+    if value is None:
+      continue
+    lines.append('# HELP {0} {1}'.format(name, help))
+    lines.append('# TYPE {0} {1}'.format(name, type))
+    lines.append('{0} {1}'.format(name, value))
+  return '\n'.join(lines) + '\n'
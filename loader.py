@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+
+import dateutil.parser
+
+from forms import Genre, State
+
+#----------------------------------------------------------------------------#
+# Bulk catalogue loading for `flask import`.
+#
+# Files are CSV or NDJSON in the layout `flask export` writes. Rows are
+# checked here and handed back as column dicts; load_rows() then writes a
+# chunk with a single COPY on PostgreSQL and a single executemany INSERT
+# everywhere else.
+#----------------------------------------------------------------------------#
+
+STATES = set(state.value for state in State)
+GENRES = set(genre.value for genre in Genre)
+TRUE_VALUES = ('true', 't', 'yes', 'y', '1')
+
+
+def read_file(f, format):
+  # Yields (line number, record, error) for each row of an open text file;
+  # record is None and error says why for an NDJSON line that isn't a JSON
+  # object, so the caller can reject it like any other bad row.
+  if format == 'ndjson':
+    for number, line in enumerate(f, 1):
+      if not line.strip():
+        continue
+      try:
+        record = json.loads(line)
+      except ValueError as e:
+        yield number, None, 'is not JSON: {0}'.format(e)
+        continue
+      if not isinstance(record, dict):
+        yield number, None, 'is not a JSON object'
+        continue
+      yield number, record, None
+    return
+  reader = csv.DictReader(f)
+  for record in reader:
+    yield reader.line_num, dict((key, value if value != '' else None) for key, value in record.items()), None
+
+
+def text(record, field, errors, required=False):
+  value = record.get(field)
+  if value is None or str(value).strip() == '':
+    if required:
+      errors[field] = 'is required'
+    return None
+  return str(value).strip()
+
+
+def flag(value):
+  if isinstance(value, bool):
+    return value
+  return value is not None and str(value).strip().lower() in TRUE_VALUES
+
+
+def integer(record, field, errors):
+  value = record.get(field)
+  if value is None or value == '':
+    return None
+  try:
+    return int(value)
+  except (TypeError, ValueError):
+    errors[field] = 'is not a number'
+
+
+def moment(record, field, errors):
+  value = record.get(field)
+  if value is None or value == '':
+    errors[field] = 'is required'
+    return None
+  try:
+    return dateutil.parser.parse(value)
+  except (TypeError, AttributeError, ValueError, OverflowError):
+    errors[field] = 'is not a date and time'
+
+
+def genre_names(record, errors):
+  value = record.get('genres') or []
+  if isinstance(value, str):
+    value = value.split(',')
+  names = [name.strip() for name in value if name and name.strip()]
+  unknown = [name for name in names if name not in GENRES]
+  if unknown:
+    errors['genres'] = 'unknown genre ' + ', '.join(unknown)
+  return sorted(set(names))
+
+
+def owner_row(record, columns, flags):
+  # Venue and artist rows: the text columns, the boolean flags and the genres.
+  errors = {}
+  row = {'id': integer(record, 'id', errors)}
+  for column in columns:
+    row[column] = text(record, column, errors, required=column in ('name', 'city', 'state'))
+  for column in flags:
+    row[column] = flag(record.get(column))
+  if row['state'] is not None and row['state'] not in STATES:
+    errors['state'] = 'unknown state ' + row['state']
+  row['genres'] = genre_names(record, errors)
+  return row, errors
+
+
+def venue_row(record):
+  return owner_row(record, ['name', 'city', 'state', 'address', 'phone', 'website', 'facebook_link',
+                            'image_link', 'seeking_description'], ['seeking_talent'])
+
+
+def artist_row(record):
+  return owner_row(record, ['name', 'city', 'state', 'phone', 'website', 'facebook_link',
+                            'image_link', 'seeking_description'], ['seeking_venue'])
+
+
+def show_row(record, max_length=None):
+  # venue and artist are given by id or, for files exported from another
+  # database, by name; names are resolved to ids by the caller. Shows
+  # longer than max_length, a timedelta, are rejected.
+  errors = {}
+  row = {
+    'id': integer(record, 'id', errors),
+    'venue_id': integer(record, 'venue_id', errors),
+    'venue_name': text(record, 'venue_name', errors),
+    'artist_id': integer(record, 'artist_id', errors),
+    'artist_name': text(record, 'artist_name', errors),
+    'start_time': moment(record, 'start_time', errors),
+    'end_time': moment(record, 'end_time', errors),
+  }
+  for owner in ('venue', 'artist'):
+    if row[owner + '_id'] is None and row[owner + '_name'] is None and owner + '_id' not in errors:
+      errors[owner + '_id'] = 'is required, or ' + owner + '_name'
+  if row['start_time'] and row['end_time'] and row['end_time'] <= row['start_time']:
+    errors['end_time'] = 'must be after start_time'
+  elif row['start_time'] and row['end_time'] and max_length is not None and row['end_time'] - row['start_time'] > max_length:
+    errors['end_time'] = 'must be at most {0} after start_time'.format(max_length)
+  return row, errors
+
+
+def copy_value(value):
+  return '\\N' if value is None else value
+
+
+def load_rows(connection, table, columns, rows):
+  # Writes rows (dicts holding at least columns) into table.
+  if not rows:
+    return
+  driver = connection.dialect.driver if connection.dialect.name == 'postgresql' else None
+  if driver not in ('psycopg2', 'psycopg'):
+    connection.execute(table.insert(), [dict((column, row[column]) for column in columns) for row in rows])
+    return
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in rows:
+    writer.writerow([copy_value(row[column]) for column in columns])
+  sql = "COPY {0} ({1}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(table.name, ', '.join(columns))
+  cursor = connection.connection.cursor()
+  try:
+    if driver == 'psycopg2':
+      buffer.seek(0)
+      cursor.copy_expert(sql, buffer)
+    else:
+      with cursor.copy(sql) as copy:
+        copy.write(buffer.getvalue())
+  finally:
+    cursor.close()
@@ -0,0 +1,60 @@
+"""empty message
+
+Revision ID: 6d2f8b3e1a94
+Revises: b4e8f1a6c9d2
+Create Date: 2026-10-19 10:04:51.271930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2f8b3e1a94'
+down_revision = 'b4e8f1a6c9d2'
+branch_labels = None
+depends_on = None
+
+MAX_SHOW_HOURS = 24
+LENGTH_CHECKS = {
+    'postgresql': "end_time - start_time <= interval '{0} hours'".format(MAX_SHOW_HOURS),
+    'sqlite': 'round((julianday(end_time) - julianday(start_time)) * 86400) <= {0}'.format(MAX_SHOW_HOURS * 3600),
+}
+
+
+def upgrade():
+    # The overlap checks only look MAX_SHOW_HOURS back for shows still
+    # running, so a longer show would let bookings overlap it. Existing ones
+    # are not shortened here: the upgrade stops until they are fixed. (Not
+    # RuntimeError, which flask db reports through a logger env.py's logging
+    # config silences.)
+    dialect = op.get_bind().dialect.name
+    if dialect not in LENGTH_CHECKS:
+        return
+    check = LENGTH_CHECKS[dialect]
+    too_long = [id for id, in op.get_bind().execute(sa.text(
+        'SELECT id FROM shows WHERE NOT ({0}) ORDER BY id'.format(check)))]
+    if too_long:
+        raise ValueError('{0} shows last longer than {1} hours (ids {2}{3}); shorten or split them, then upgrade again.'.format(
+            len(too_long), MAX_SHOW_HOURS, ', '.join(str(id) for id in too_long[:20]), ', ...' if len(too_long) > 20 else ''))
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.create_check_constraint('ck_shows_length', check)
+    if dialect == 'postgresql':
+        # A venue or artist can't hold two shows touching each other, even
+        # if a writer skips show_validation(). Closed ranges, as there.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for owner in ('venue', 'artist'):
+            op.execute(
+                'ALTER TABLE shows ADD CONSTRAINT ex_shows_{0}_overlap EXCLUDE USING gist '
+                "({0}_id WITH =, tsrange(start_time, end_time, '[]') WITH &&)".format(owner))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect not in LENGTH_CHECKS:
+        return
+    if dialect == 'postgresql':
+        op.execute('ALTER TABLE shows DROP CONSTRAINT ex_shows_artist_overlap')
+        op.execute('ALTER TABLE shows DROP CONSTRAINT ex_shows_venue_overlap')
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_constraint('ck_shows_length', type_='check')
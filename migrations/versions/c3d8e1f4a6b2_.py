@@ -0,0 +1,35 @@
+"""empty message
+
+Revision ID: c3d8e1f4a6b2
+Revises: 9b1e5d3c7a20
+Create Date: 2026-10-18 20:05:37.842190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8e1f4a6b2'
+down_revision = '9b1e5d3c7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Trigram GIN indexes let PostgreSQL serve name ILIKE '%term%' from an
+    # index. Other databases use the in-process index in search.py instead.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
@@ -0,0 +1,95 @@
+"""empty message
+
+Revision ID: f1a8c4e6b3d7
+Revises: e5f2c7a3d9b4
+Create Date: 2026-10-18 21:48:26.309114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a8c4e6b3d7'
+down_revision = 'e5f2c7a3d9b4'
+branch_labels = None
+depends_on = None
+
+# forms.Genre values at the time of this migration.
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+          'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+          'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other']
+
+
+def parse_genres(value):
+    # Rows hold either 'Jazz,Rock n Roll' or, where a Python list was assigned
+    # to the String column on PostgreSQL, an array literal like '{Jazz,"Hip-Hop"}'.
+    if not value:
+        return []
+    value = value.strip()
+    if value.startswith('{') and value.endswith('}'):
+        value = value[1:-1]
+    names = [name.strip().strip('"').strip() for name in value.split(',')]
+    return [name for name in names if name]
+
+
+def upgrade():
+    genre = op.create_table('genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id_venue_id', 'venue_genres', ['genre_id', 'venue_id'], unique=False)
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genres_genre_id_artist_id', 'artist_genres', ['genre_id', 'artist_id'], unique=False)
+
+    op.bulk_insert(genre, [{'name': name} for name in GENRES])
+    connection = op.get_bind()
+    genre_ids = dict((name, id) for id, name in connection.execute(sa.text('SELECT id, name FROM genre')))
+    for table, link, key in (('venue', 'venue_genres', 'venue_id'), ('artist', 'artist_genres', 'artist_id')):
+        links = []
+        for id, value in connection.execute(sa.text('SELECT id, genres FROM {0}'.format(table))):
+            for name in set(parse_genres(value)):
+                if name not in genre_ids:
+                    genre_ids[name] = connection.execute(
+                        sa.text('INSERT INTO genre (name) VALUES (:name) RETURNING id'), {'name': name}).scalar()
+                links.append({key: id, 'genre_id': genre_ids[name]})
+        if links:
+            connection.execute(sa.text('INSERT INTO {0} ({1}, genre_id) VALUES (:{1}, :genre_id)'.format(link, key)), links)
+
+    op.drop_column('venue', 'genres')
+    op.drop_column('artist', 'genres')
+
+
+def downgrade():
+    op.add_column('artist', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('venue', sa.Column('genres', sa.String(length=120), nullable=True))
+    connection = op.get_bind()
+    for table, link, key in (('venue', 'venue_genres', 'venue_id'), ('artist', 'artist_genres', 'artist_id')):
+        names = {}
+        for id, name in connection.execute(sa.text(
+                'SELECT {0}.{1}, genre.name FROM {0} JOIN genre ON genre.id = {0}.genre_id ORDER BY genre.name'.format(link, key))):
+            names.setdefault(id, []).append(name)
+        for id, genres in names.items():
+            connection.execute(sa.text('UPDATE {0} SET genres = :genres WHERE id = :id'.format(table)),
+                               {'genres': ','.join(genres)[:120], 'id': id})
+
+    op.drop_index('ix_artist_genres_genre_id_artist_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_id_venue_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('genre')
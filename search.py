@@ -0,0 +1,282 @@
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from contextlib import nullcontext
+from flask import current_app
+from sqlalchemy import func
+
+#----------------------------------------------------------------------------#
+# Name search backends.
+#
+# Both backends answer the same question as the original
+# `name.ilike('%term%')` filter: which rows contain the search term in their
+# name, case-insensitively. Matches are ranked by trigram similarity to the
+# term (the measure pg_trgm uses) and returned a page at a time.
+#
+# Autocomplete answers a narrower question, which names have a word starting
+# with what has been typed so far, from a prefix index held in memory
+# whatever the database.
+#
+# The in-memory indexes are read by requests and updated by the write
+# handlers concurrently (threaded servers, and asgi.py's event loop next to
+# its thread pool), so each guards its state with a lock.
+#----------------------------------------------------------------------------#
+
+WORD = re.compile(r'\w+')
+
+def trigrams(value):
+  value = value.lower()
+  return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def grams(value):
+  # Every substring of one to three characters, so that a term of any
+  # length up to three has a posting list of exactly the names holding it.
+  value = value.lower()
+  return {value[i:i + n] for n in (1, 2, 3) for i in range(len(value) - n + 1)}
+
+
+def similarity(term_trigrams, name_trigrams):
+  if not term_trigrams or not name_trigrams:
+    return 0.0
+  shared = len(term_trigrams & name_trigrams)
+  return shared / float(len(term_trigrams | name_trigrams))
+
+
+class PostgresSearch(object):
+  # Relies on the pg_trgm GIN indexes on venue.name and artist.name, which
+  # let PostgreSQL answer ILIKE '%term%' without a sequential scan.
+
+  def search(self, model, term, limit, offset=0):
+    matches = model.query.filter(model.name.ilike('%' + term + '%'))
+    total = matches.count()
+    rows = matches.order_by(func.similarity(model.name, term).desc(), model.id).limit(limit).offset(offset).all()
+    return total, rows
+
+  def add(self, model, id, name):
+    pass
+
+  def remove(self, model, id):
+    pass
+
+
+class TrigramIndex(object):
+  # Inverted index from trigram to the ids of the names containing it. A
+  # name contains the term only if it contains every trigram of the term,
+  # so intersecting the posting lists leaves a small set to verify. Names
+  # are also posted under their one and two character substrings, which
+  # answer shorter terms directly; the empty term matches every name, as
+  # ILIKE '%%' does.
+
+  def __init__(self, rows=()):
+    self.names = {}
+    self.postings = {}
+    self.lock = threading.RLock()
+    for id, name in rows:
+      self.add(id, name)
+
+  def add(self, id, name):
+    with self.lock:
+      self.remove(id)
+      name = name or ''
+      self.names[id] = name
+      for gram in grams(name):
+        self.postings.setdefault(gram, set()).add(id)
+
+  def remove(self, id):
+    with self.lock:
+      name = self.names.pop(id, None)
+      if name is None:
+        return
+      for gram in grams(name):
+        ids = self.postings.get(gram)
+        if ids is not None:
+          ids.discard(id)
+          if not ids:
+            del self.postings[gram]
+
+  def search(self, term, limit, offset=0):
+    term_lower = term.lower()
+    term_trigrams = trigrams(term)
+    with self.lock:
+      if not term_trigrams:
+        # nothing to rank by, so in id order
+        matches = sorted(self.postings.get(term_lower, ()) if term_lower else self.names)
+        return len(matches), matches[offset:offset + limit]
+      candidates = None
+      for trigram in sorted(term_trigrams, key=lambda t: len(self.postings.get(t, ()))):
+        ids = self.postings.get(trigram, set())
+        candidates = set(ids) if candidates is None else candidates & ids
+        if not candidates:
+          break
+      matches = [(id, self.names[id]) for id in candidates if term_lower in self.names[id].lower()]
+    matches.sort(key=lambda match: (-similarity(term_trigrams, trigrams(match[1])), match[0]))
+    return len(matches), [id for id, name in matches[offset:offset + limit]]
+
+
+class NameIndexes(ABC):
+  # One in-memory name index per model, built from the database on first
+  # use and kept current by add()/remove() from the write handlers of this
+  # process. An index older than max_age seconds is rebuilt in a background
+  # thread, to pick up writes made by other workers and by `flask import`,
+  # while requests go on using the old one; writes made meanwhile are
+  # replayed onto the new index before it replaces the old. build_scope, if
+  # given, is a context manager the builds run in; it must read the
+  # primary, since a lagging replica's rows would stay in the index.
+
+  def __init__(self, build_scope=None, max_age=None):
+    self.indexes = {}
+    self.built = {}
+    self.pending = {}
+    self.build_scope = build_scope
+    self.max_age = max_age
+    self.lock = threading.RLock()
+
+  @abstractmethod
+  def make_index(self, rows):
+    # Returns a new index over rows of (id, name).
+    pass
+
+  def load(self, model):
+    with self.build_scope() if self.build_scope else nullcontext():
+      return self.make_index(model.query.with_entities(model.id, model.name).all())
+
+  def index(self, model):
+    with self.lock:
+      if model not in self.indexes:
+        # nothing to serve yet, so the first build happens in the request
+        self.indexes[model] = self.load(model)
+        self.built[model] = time.monotonic()
+      elif self.max_age and model not in self.pending and time.monotonic() - self.built[model] > self.max_age:
+        self.pending[model] = []
+        threading.Thread(target=self.refresh, args=(current_app._get_current_object(), model), daemon=True).start()
+      return self.indexes[model]
+
+  def refresh(self, app, model):
+    try:
+      with app.app_context():
+        index = self.load(model)
+    except:
+      print(sys.exc_info())
+      index = None
+    with self.lock:
+      changes = self.pending.pop(model)
+      # on failure the old index is kept, and rebuilt again after max_age
+      self.built[model] = time.monotonic()
+      if index is None:
+        return
+      for id, name, removed in changes:
+        if removed:
+          index.remove(id)
+        else:
+          index.add(id, name)
+      self.indexes[model] = index
+
+  def add(self, model, id, name):
+    with self.lock:
+      if model in self.indexes:
+        self.indexes[model].add(id, name)
+      if model in self.pending:
+        self.pending[model].append((id, name, False))
+
+  def remove(self, model, id):
+    with self.lock:
+      if model in self.indexes:
+        self.indexes[model].remove(id)
+      if model in self.pending:
+        self.pending[model].append((id, None, True))
+
+
+class MemorySearch(NameIndexes):
+  # Fallback for SQLite and development databases without pg_trgm.
+
+  def make_index(self, rows):
+    return TrigramIndex(rows)
+
+  def search(self, model, term, limit, offset=0):
+    total, ids = self.index(model).search(term, limit, offset)
+    if not ids:
+      return total, []
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+    return total, [rows[id] for id in ids if id in rows]
+
+
+def name_words(value):
+  return WORD.findall((value or '').casefold())
+
+
+def name_keys(name):
+  # The name's words from each word on, e.g. 'the blue note', 'blue note'
+  # and 'note', so that a prefix of any word finds it.
+  words = name_words(name)
+  return set(' '.join(words[i:]) for i in range(len(words)))
+
+
+class PrefixIndex(object):
+  # Sorted array of (key, id) pairs, one per name key. The names starting
+  # with a prefix are a contiguous run of the array, found by bisecting to
+  # the prefix and reading forward while keys still start with it.
+
+  def __init__(self, rows=()):
+    self.names = {}
+    self.keys = []
+    self.lock = threading.RLock()
+    for id, name in rows:
+      self.names[id] = name or ''
+      self.keys.extend((key, id) for key in name_keys(name))
+    self.keys.sort()
+
+  def add(self, id, name):
+    with self.lock:
+      self.remove(id)
+      self.names[id] = name or ''
+      for key in name_keys(name):
+        insort(self.keys, (key, id))
+
+  def remove(self, id):
+    with self.lock:
+      name = self.names.pop(id, None)
+      if name is None:
+        return
+      for key in name_keys(name):
+        i = bisect_left(self.keys, (key, id))
+        if i < len(self.keys) and self.keys[i] == (key, id):
+          del self.keys[i]
+
+  def complete(self, prefix, limit):
+    # Up to limit (id, name) pairs with a word starting with prefix, in
+    # order of the matching key.
+    prefix = ' '.join(name_words(prefix))
+    if not prefix:
+      return []
+    found, seen = [], set()
+    with self.lock:
+      i = bisect_left(self.keys, (prefix,))
+      while i < len(self.keys) and len(found) < limit:
+        key, id = self.keys[i]
+        if not key.startswith(prefix):
+          break
+        if id not in seen:
+          seen.add(id)
+          found.append((id, self.names[id]))
+        i += 1
+    return found
+
+
+class Autocomplete(NameIndexes):
+  # A PrefixIndex per model, refreshed as described for NameIndexes.
+
+  def make_index(self, rows):
+    return PrefixIndex(rows)
+
+  def complete(self, model, prefix, limit):
+    return self.index(model).complete(prefix, limit)
+
+
+def search_backend_for(engine, build_scope=None, max_age=None):
+  if engine.dialect.name == 'postgresql':
+    return PostgresSearch()
+  return MemorySearch(build_scope, max_age)
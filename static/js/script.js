@@ -1,4 +1,123 @@
 window.parseISOString = function parseISOString(s) {
     var b = s.split(/\D+/);
     return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
-};
\ No newline at end of file
+};
+
+// Typeahead for inputs with data-autocomplete="venue" or "artist". Names are
+// looked up with /api/autocomplete once typing pauses; picking one fills the
+// input named by data-target with its id, or, without a target (the search
+// boxes), opens its page.
+(function () {
+    var DELAY = 150;
+    var PAGES = {venue: '/venues/', artist: '/artists/'};
+
+    function setUp(input) {
+        var kind = input.getAttribute('data-autocomplete');
+        var target = document.getElementById(input.getAttribute('data-target'));
+        var menu = document.createElement('ul');
+        var timer = null;
+        var latest = 0;
+        var active = -1;
+        menu.className = 'dropdown-menu autocomplete-menu';
+        input.parentNode.style.position = 'relative';
+        input.parentNode.insertBefore(menu, input.nextSibling);
+        input.setAttribute('autocomplete', 'off');
+
+        function hide() {
+            menu.style.display = 'none';
+            active = -1;
+        }
+
+        function choose(match) {
+            hide();
+            if (target) {
+                input.value = match.name;
+                target.value = match.id;
+            } else {
+                window.location = PAGES[kind] + match.id;
+            }
+        }
+
+        function highlight(index) {
+            var items = menu.children;
+            if (!items.length) return;
+            active = (index + items.length) % items.length;
+            for (var i = 0; i < items.length; i++) {
+                items[i].className = i === active ? 'active' : '';
+            }
+        }
+
+        function show(matches) {
+            menu.innerHTML = '';
+            matches.forEach(function (match) {
+                var item = document.createElement('li');
+                var link = document.createElement('a');
+                link.href = PAGES[kind] + match.id;
+                link.textContent = match.name;
+                link.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    choose(match);
+                });
+                item.match = match;
+                item.appendChild(link);
+                menu.appendChild(item);
+            });
+            active = -1;
+            menu.style.display = matches.length ? 'block' : 'none';
+        }
+
+        function lookup() {
+            var q = input.value.trim();
+            var request = ++latest;
+            if (!q) {
+                hide();
+                return;
+            }
+            fetch('/api/autocomplete?type=' + kind + '&q=' + encodeURIComponent(q))
+                .then(function (response) { return response.json(); })
+                .then(function (result) {
+                    // drop answers to queries that have since been retyped
+                    if (request === latest) show(result[kind + 's'] || []);
+                })
+                .catch(hide);
+        }
+
+        input.addEventListener('input', function () {
+            if (target) target.value = '';
+            clearTimeout(timer);
+            timer = setTimeout(lookup, DELAY);
+        });
+        input.addEventListener('keydown', function (event) {
+            if (menu.style.display !== 'block') return;
+            if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+                event.preventDefault();
+                highlight(active + (event.key === 'ArrowDown' ? 1 : -1));
+            } else if (event.key === 'Enter' && active >= 0) {
+                event.preventDefault();
+                choose(menu.children[active].match);
+            } else if (event.key === 'Escape') {
+                hide();
+            }
+        });
+        input.addEventListener('blur', hide);
+    }
+
+    Array.prototype.forEach.call(document.querySelectorAll('[data-autocomplete]'), setUp);
+})();
+
+
+// "Near me" links: adds the browser's position to the link as ?lat=&lng=.
+// Without one (no geolocation, or permission refused) the link is followed
+// as is, to a page asking for a city.
+Array.prototype.forEach.call(document.querySelectorAll('[data-near-me]'), function (link) {
+    link.addEventListener('click', function (event) {
+        if (!navigator.geolocation) return;
+        event.preventDefault();
+        navigator.geolocation.getCurrentPosition(function (position) {
+            window.location = link.href + '?lat=' + position.coords.latitude.toFixed(5) +
+                '&lng=' + position.coords.longitude.toFixed(5);
+        }, function () {
+            window.location = link.href;
+        }, {timeout: 10000});
+    });
+});
@@ -0,0 +1,32 @@
+# Fixtures running the app against a throwaway SQLite database, or against
+# TEST_DATABASE_URL (e.g. an empty PostgreSQL database) when that is set.
+# app.py reads its configuration when imported, so the environment is set
+# first.
+
+import os
+import tempfile
+
+import pytest
+
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'tests.db')
+os.environ['CACHE_TYPE'] = 'null'
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+from app import app as flask_app, db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    yield app.test_client()
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
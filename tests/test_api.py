@@ -0,0 +1,52 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, Artist
+
+VENUE = {'name': 'The Parlour', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+         'phone': '512-555-0100', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/parlour',
+         'website': 'https://parlour.example.com', 'image_link': 'https://parlour.example.com/front.jpg'}
+
+
+def send(client, method, path, records):
+    response = client.open(path, method=method, data=json.dumps(records), content_type='application/json')
+    return response.status_code, response.get_json()
+
+
+@pytest.fixture
+def venue_id(client):
+    status, body = send(client, 'POST', '/api/v1/venues', [VENUE])
+    assert status == 200, body
+    return body['ids'][0]
+
+
+def test_update_rejects_repeated_id(client, venue_id):
+    status, body = send(client, 'PATCH', '/api/v1/venues', [
+        {'id': venue_id, 'genres': ['Jazz', 'Blues']},
+        {'id': venue_id, 'genres': ['Folk']},
+    ])
+    assert status == 422
+    assert body['ids'] == [venue_id]
+    assert body['errors'] == [{'index': 1, 'errors': {'id': ['Repeats the id of an earlier record.']}}]
+
+
+@pytest.mark.parametrize('bad_id', [[1], '1', True, 1.0, None])
+def test_update_rejects_non_integer_id(client, venue_id, bad_id):
+    status, body = send(client, 'PATCH', '/api/v1/venues', [{'id': bad_id, 'name': 'Renamed'}, {'id': venue_id, 'name': 'Renamed'}])
+    assert status == 422
+    assert body['ids'] == [venue_id]
+    assert body['errors'] == [{'index': 0, 'errors': {'id': ['Must be an integer.']}}]
+
+
+@pytest.mark.parametrize('bad_id', [True, [1], '1'])
+def test_create_shows_rejects_non_integer_owner(app, client, venue_id, bad_id):
+    with app.app_context():
+        db.session.add(Artist(id=1, name='The Band', city='Austin', state='TX'))
+        db.session.commit()
+    start = datetime.now() + timedelta(days=30)
+    show = {'venue_id': venue_id, 'artist_id': bad_id, 'start_time': str(start), 'end_time': str(start + timedelta(hours=2))}
+    status, body = send(client, 'POST', '/api/v1/shows', [show])
+    assert status == 422
+    assert body['errors'] == [{'index': 0, 'errors': {'artist_id': ['No such artist.']}}]
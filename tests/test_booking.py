@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db, Venue, Artist, Shows, book_show, show_validation
+
+START = datetime(2031, 5, 1, 20)
+
+
+@pytest.fixture
+def owners(app, client):
+    with app.app_context():
+        db.session.add_all([Venue(id=1, name='The Parlour', city='Austin', state='TX'),
+                            Artist(id=1, name='The Band', city='Austin', state='TX'),
+                            Artist(id=2, name='The Other Band', city='Austin', state='TX')])
+        db.session.commit()
+
+
+def test_database_rejects_show_longer_than_limit(app, owners):
+    limit = timedelta(hours=app.config['MAX_SHOW_HOURS'])
+    with app.app_context():
+        db.session.add(Shows(venue_id=1, artist_id=1, start_time=START, end_time=START + limit))
+        db.session.commit()
+        db.session.add(Shows(venue_id=1, artist_id=1, start_time=START + 2 * limit, end_time=START + 3 * limit + timedelta(seconds=1)))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_overlap_found_at_the_longest_show_length(app, owners):
+    limit = timedelta(hours=app.config['MAX_SHOW_HOURS'])
+    with app.app_context():
+        assert book_show(1, 1, START, START + limit) is not None
+        db.session.commit()
+        # starts as the first show ends, a whole limit after it started
+        assert not show_validation(artist_id=2, venue_id=1, start_time=START + limit, end_time=START + limit + timedelta(hours=1))
+        assert show_validation(artist_id=2, venue_id=1, start_time=START + limit + timedelta(seconds=1),
+                               end_time=START + limit + timedelta(hours=1))
+        assert book_show(1, 2, START + 2 * limit, START + 3 * limit + timedelta(seconds=1)) is None
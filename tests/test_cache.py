@@ -0,0 +1,46 @@
+import os
+import time
+
+from cache import FileSystemCache, MemoryCache, ViewCache
+
+
+def test_memory_cache_write_invalidates_page_after_overflow():
+    cache = ViewCache(MemoryCache(max_entries=4))
+    cache.get_or_set(('venues',), '/venues', lambda: 'old')
+    cache.invalidate('venues')
+    assert cache.get_or_set(('venues',), '/venues', lambda: 'new') == 'new'
+    # push every generation and page out of the LRU bound
+    for i in range(20):
+        cache.get_or_set(('artists',), '/artists?page={0}'.format(i), lambda: i)
+    cache.invalidate('venues')
+    assert cache.get_or_set(('venues',), '/venues', lambda: 'newer') == 'newer'
+
+
+def test_memory_cache_generations_survive_eviction():
+    backend = MemoryCache(max_entries=2)
+    first = backend.bump('venues')
+    for i in range(10):
+        backend.set(i, i)
+    assert backend.generation('venues') == first
+    assert backend.bump('venues') > first
+
+
+def test_filesystem_cache_removes_expired_entry_on_read(tmp_path):
+    backend = FileSystemCache(str(tmp_path), ttl=-1)
+    backend.set('page', 'value')
+    assert backend.get('page') is None
+    assert not os.path.exists(backend.path('page'))
+
+
+def test_filesystem_cache_sweep_bounds_directory(tmp_path):
+    backend = FileSystemCache(str(tmp_path), ttl=300, max_entries=3)
+    backend.SWEEP_EVERY = 10 ** 9
+    generation = backend.bump('venues')
+    now = time.time()
+    for i in range(10):
+        backend.set(i, i)
+        os.utime(backend.path(i), (now - 10 + i, now - 10 + i))
+    os.utime(backend.path(9), (now - 600, now - 600))
+    assert backend.sweep() == 7
+    assert [backend.get(i) for i in range(10)] == [None] * 6 + [6, 7, 8, None]
+    assert backend.generation('venues') == generation
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, Venue, Artist, Shows
+
+START = datetime(2031, 5, 1, 20)
+
+
+@pytest.fixture
+def owners(app, client):
+    with app.app_context():
+        db.session.add_all([Venue(id=1, name='The Parlour', city='Austin', state='TX'),
+                            Artist(id=1, name='The Band', city='Austin', state='TX')])
+        db.session.commit()
+
+
+def show(id, day):
+    return {'id': id, 'venue_id': 1, 'artist_id': 1,
+            'start_time': str(START + timedelta(days=day)), 'end_time': str(START + timedelta(days=day, hours=2))}
+
+
+def write_ndjson(tmp_path, lines):
+    path = tmp_path / 'shows.ndjson'
+    path.write_text('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines) + '\n')
+    return str(path)
+
+
+def show_ids(app):
+    with app.app_context():
+        return sorted(id for id, in db.session.query(Shows.id))
+
+
+def test_import_rejects_unreadable_lines(app, owners, tmp_path):
+    path = write_ndjson(tmp_path, [show(1, 0), '{"id": 2,', '[1, 2]', show(3, 1), '"text"'])
+    result = app.test_cli_runner().invoke(args=['import', 'shows', path])
+    assert result.exit_code == 0, result.output
+    assert 'imported 2 shows, rejected 3' in result.output
+    assert '{0}:2: line is not JSON'.format(path) in result.output
+    assert '{0}:3: line is not a JSON object'.format(path) in result.output
+    assert show_ids(app) == [1, 3]
+
+
+def test_import_rejects_wrongly_typed_values(app, owners, tmp_path):
+    venue = {'name': 'The Den', 'city': 'Austin', 'state': 'TX', 'genres': 5}
+    path = tmp_path / 'venues.ndjson'
+    path.write_text(json.dumps(venue) + '\n')
+    result = app.test_cli_runner().invoke(args=['import', 'venues', str(path)])
+    assert result.exit_code == 0, result.output
+    assert 'imported 0 venues, rejected 1' in result.output
+
+
+def test_import_skips_existing_and_repeated_ids(app, owners, tmp_path):
+    runner = app.test_cli_runner()
+    first = write_ndjson(tmp_path, [show(1, 0), show(2, 1)])
+    assert 'imported 2 shows, rejected 0' in runner.invoke(args=['import', 'shows', first]).output
+    again = write_ndjson(tmp_path, [show(1, 0), show(3, 2), show(3, 3), {k: v for k, v in show(None, 4).items() if k != 'id'}])
+    result = runner.invoke(args=['import', 'shows', again, '--chunk-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'shows id 1 already exists' in result.output
+    assert 'shows id 3 already exists' in result.output
+    assert 'imported 2 shows, rejected 2' in result.output
+    assert show_ids(app) == [1, 2, 3, 4]
+
+
+def test_import_refused_by_database_rolls_back(app, owners, tmp_path, monkeypatch):
+    # stands in for a conflict only the database catches
+    monkeypatch.setattr('app.import_new_ids', lambda model, rows, path, stats: rows)
+    path = write_ndjson(tmp_path, [show(1, 0), show(1, 1)])
+    result = app.test_cli_runner().invoke(args=['import', 'shows', path])
+    assert result.exit_code == 1
+    assert 'Error: nothing was imported: UNIQUE constraint failed' in result.output
+    assert show_ids(app) == []
@@ -0,0 +1,41 @@
+from app import db, Venue, locate_venue
+
+
+def add_venue(app, name, city, state):
+    with app.app_context():
+        venue = Venue(name=name, city=city, state=state)
+        locate_venue(venue)
+        db.session.add(venue)
+        db.session.commit()
+
+
+def test_nearby_without_position_asks_for_city(client):
+    response = client.get('/venues/nearby')
+    assert response.status_code == 200
+    assert b'name="city"' in response.data
+
+
+def test_nearby_json_without_position_is_bad_request(client):
+    assert client.get('/venues/nearby', query_string={'format': 'json'}).status_code == 400
+
+
+def test_nearby_by_city(app, client):
+    add_venue(app, 'The Parlour', 'Austin', 'TX')
+    add_venue(app, 'Deep Ellum', 'Dallas', 'TX')
+    response = client.get('/venues/nearby', query_string={'city': 'austin', 'state': 'TX', 'format': 'json'})
+    assert [venue['name'] for venue in response.get_json()['venues']] == ['The Parlour']
+    page = client.get('/venues/nearby', query_string={'city': 'Austin', 'state': 'TX'})
+    assert b'The Parlour' in page.data and b'of Austin, TX' in page.data
+
+
+def test_nearby_unknown_city(client):
+    response = client.get('/venues/nearby', query_string={'city': 'Atlantis', 'state': 'TX'})
+    assert response.status_code == 200
+    assert b"couldn't find that city" in response.data
+
+
+def test_nearby_by_coordinates(app, client):
+    add_venue(app, 'The Parlour', 'Austin', 'TX')
+    response = client.get('/venues/nearby', query_string={'lat': 30.27, 'lng': -97.74, 'format': 'json'})
+    assert [venue['name'] for venue in response.get_json()['venues']] == ['The Parlour']
+    assert client.get('/venues/nearby', query_string={'lat': 30.27}).status_code == 400
@@ -0,0 +1,60 @@
+import base64
+import json
+
+import pytest
+
+from app import db, Venue, Artist
+
+
+def cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.fixture
+def catalogue(app, client):
+    with app.app_context():
+        for i in range(1, 4):
+            db.session.add(Venue(id=i, name='Venue {0}'.format(i), city='Austin', state='TX'))
+            db.session.add(Artist(id=i, name='Artist {0}'.format(i), city='Austin', state='TX'))
+        db.session.commit()
+    return client
+
+
+BAD_CURSORS = [
+    'not base64!',
+    base64.urlsafe_b64encode(b'not json').decode(),
+    cursor(5),
+    cursor({'id': 1}),
+    cursor([]),
+    cursor([1, 2, 3, 4]),
+    cursor(['1']),
+    cursor([True]),
+    cursor([[1]]),
+]
+
+
+@pytest.mark.parametrize('after', BAD_CURSORS)
+def test_artists_rejects_malformed_cursor(catalogue, after):
+    assert catalogue.get('/artists', query_string={'after': after}).status_code == 400
+    assert catalogue.get('/artists', query_string={'before': after}).status_code == 400
+
+
+@pytest.mark.parametrize('after', BAD_CURSORS + [cursor(['Austin', 'TX', 'x']), cursor([1, 'TX', 1])])
+def test_venues_rejects_malformed_cursor(catalogue, after):
+    assert catalogue.get('/venues', query_string={'after': after}).status_code == 400
+
+
+@pytest.mark.parametrize('after', BAD_CURSORS + [cursor(['not a date', 1]), cursor([1, 1])])
+def test_shows_rejects_malformed_cursor(catalogue, after):
+    assert catalogue.get('/shows', query_string={'after': after}).status_code == 400
+
+
+def test_artists_follows_cursor(catalogue):
+    first = catalogue.get('/artists', query_string={'limit': 2, 'format': 'json'}).get_json()
+    assert [artist['id'] for artist in first['artists']] == [1, 2]
+    second = catalogue.get('/artists', query_string={'limit': 2, 'format': 'json', 'after': first['cursors']['next']}).get_json()
+    assert [artist['id'] for artist in second['artists']] == [3]
+
+
+def test_venues_accepts_cursor_with_null_city(catalogue):
+    assert catalogue.get('/venues', query_string={'after': cursor([None, None, 0])}).status_code == 200
@@ -0,0 +1,76 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, Venue, Artist, Shows, Genres
+
+
+def query_count(response):
+    return int(re.search(r'"(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+
+def book(app, id, shows):
+    # A venue and an artist numbered id with `shows` shows each, half past
+    # and half upcoming, each with a different partner.
+    with app.app_context():
+        genre = Genres.query.filter_by(name='Jazz').first() or Genres(name='Jazz')
+        venue = Venue(id=id, name='The Parlour', city='Austin', state='TX', genres=[genre])
+        artist = Artist(id=id, name='The Band', city='Austin', state='TX', genres=[genre])
+        db.session.add_all([venue, artist])
+        now = datetime.now()
+        for i in range(shows):
+            partner = id * 1000 + i
+            start = now + timedelta(days=i - shows // 2, hours=1)
+            db.session.add_all([
+                Venue(id=partner, name='Venue {0}'.format(partner), city='Austin', state='TX'),
+                Artist(id=partner, name='Artist {0}'.format(partner), city='Austin', state='TX'),
+                Shows(venue_id=id, artist_id=partner, start_time=start, end_time=start + timedelta(hours=2)),
+                Shows(venue_id=partner, artist_id=id, start_time=start, end_time=start + timedelta(hours=2)),
+            ])
+        db.session.commit()
+
+
+@pytest.mark.parametrize('page, endpoint', [('/venues/{0}', 'show_venue'), ('/artists/{0}', 'show_artist')])
+def test_detail_page_stays_within_budget(app, client, page, endpoint):
+    book(app, 1, 1)
+    book(app, 2, 20)
+    few = query_count(client.get(page.format(1)))
+    response = client.get(page.format(2))
+    assert response.status_code == 200
+    assert query_count(response) == few
+    assert few <= app.config['QUERY_BUDGETS'][endpoint]
+
+
+def test_over_budget_raises_when_testing(app, client, monkeypatch):
+    book(app, 1, 2)
+    monkeypatch.setitem(app.config['QUERY_BUDGETS'], 'show_venue', 0)
+    with pytest.raises(AssertionError, match='budget is 0'):
+        client.get('/venues/1')
+
+
+def test_over_budget_logs_outside_testing(app, client, monkeypatch, caplog):
+    book(app, 1, 2)
+    monkeypatch.setitem(app.config['QUERY_BUDGETS'], 'show_artist', 0)
+    monkeypatch.setattr(app, 'testing', False)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = client.get('/artists/1')
+    assert response.status_code == 200
+    assert any('show_artist issued' in record.getMessage() for record in caplog.records)
+
+
+def add_venues(app, cities):
+    with app.app_context():
+        for i, city in enumerate(cities):
+            db.session.add(Venue(name='Venue {0}'.format(i), city=city, state='TX'))
+        db.session.commit()
+
+
+def test_venue_listing_is_one_query_per_page(app, client):
+    add_venues(app, ['Austin'])
+    few = query_count(client.get('/venues'))
+    add_venues(app, ['Austin', 'Dallas', 'Houston', 'El Paso', 'Waco'] * 8)
+    response = client.get('/venues', query_string={'format': 'json'})
+    assert len(response.get_json()['areas']) == 5
+    assert query_count(response) == few
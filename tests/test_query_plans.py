@@ -0,0 +1,107 @@
+# Runs the hot read paths of app.py against a seeded database, captures
+# every statement that touches the shows table (or the upcoming_shows feed)
+# and fails on any whose query plan scans either instead of using an index.
+# Runs on PostgreSQL (TEST_DATABASE_URL) and on SQLite, whose EXPLAIN QUERY
+# PLAN also tells index searches from scans.
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import db, Artist, Venue, Shows, rebuild_upcoming_feed
+
+VENUES = 200
+ARTISTS = 200
+SHOWS = 5000
+
+# Paths whose queries filter shows and must therefore be index-backed.
+# /shows lists every show and is deliberately left out.
+HOT_PATHS = [
+    ('GET', '/venues', None),
+    ('GET', '/venues/1', None),
+    ('GET', '/artists/1', None),
+    ('GET', '/venues/1/calendar', None),
+    ('GET', '/artists/available', None),
+    ('GET', '/shows/upcoming', None),
+    ('POST', '/venues/search', {'search_term': 'Venue 1'}),
+    ('POST', '/artists/search', {'search_term': 'Artist 1'}),
+    ('POST', '/shows/create', {'artist_id': '1', 'venue_id': '1',
+                               'start_time': '2099-01-01 20:00', 'end_time': '2099-01-01 22:00'}),
+]
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    with app.app_context():
+        if db.engine.dialect.name not in ('postgresql', 'sqlite'):
+            pytest.skip('no plan check for ' + db.engine.dialect.name)
+        db.session.execute(Venue.__table__.insert(), [
+            {'name': 'Venue {0}'.format(i), 'city': 'City {0}'.format(i % 20), 'state': 'CA'}
+            for i in range(VENUES)])
+        db.session.execute(Artist.__table__.insert(), [
+            {'name': 'Artist {0}'.format(i), 'city': 'City {0}'.format(i % 20), 'state': 'CA'}
+            for i in range(ARTISTS)])
+        now = datetime.now()
+        rows = []
+        for i in range(SHOWS):
+            start_time = now + timedelta(hours=i - SHOWS // 2)
+            rows.append({'venue_id': i % VENUES + 1, 'artist_id': i * 7 % ARTISTS + 1,
+                         'start_time': start_time, 'end_time': start_time + timedelta(hours=1)})
+        db.session.execute(Shows.__table__.insert(), rows)
+        rebuild_upcoming_feed()
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+
+
+def capture_statements(app, method, path, data):
+    statements = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'shows' in statement:
+            statements.setdefault(statement, parameters)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().open(path, method=method, data=data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code < 400
+    return statements.items()
+
+
+def full_scans(statement, parameters):
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if db.engine.dialect.name == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            plan = [row[-1] for row in cursor.fetchall()]
+            # SEARCH is an index seek; SCAN walks the whole table or index.
+            return [line for line in plan if line.startswith(('SCAN shows', 'SCAN upcoming_shows'))]
+        # Make the planner reveal whether an index is usable at all, even
+        # on a dataset small enough that a sequential scan would be cheaper.
+        cursor.execute('SET enable_seqscan = off')
+        cursor.execute('EXPLAIN ' + statement, parameters)
+        plan = [row[0] for row in cursor.fetchall()]
+        return [line for line in plan if 'Seq Scan on shows' in line or 'Seq Scan on upcoming_shows' in line]
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('method, path, data', HOT_PATHS, ids=[method + ' ' + path for method, path, data in HOT_PATHS])
+def test_hot_path_uses_indexes(seeded, method, path, data):
+    statements = capture_statements(seeded, method, path, data)
+    assert statements, 'no statement touched shows'
+    with seeded.app_context():
+        scans = [(' '.join(statement.split()), lines) for statement, parameters in statements
+                 for lines in [full_scans(statement, parameters)] if lines]
+    assert not scans, '\n'.join('{0}\n  {1}'.format(statement, '\n  '.join(lines)) for statement, lines in scans)
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+from app import db, Venue
+
+VENUE = {'name': 'The New Room', 'city': 'Austin', 'state': 'TX', 'address': '2 Main St',
+         'phone': '512-555-0101', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/newroom',
+         'website': 'https://newroom.example.com', 'image_link': 'https://newroom.example.com/front.jpg'}
+
+
+@pytest.fixture
+def replica(app, client, tmp_path, monkeypatch):
+    # A second SQLite database as replica_0, holding a different venue from
+    # the primary, so each page shows which database it read.
+    engine = create_engine('sqlite:///' + str(tmp_path / 'replica.db'))
+    with app.app_context():
+        monkeypatch.setitem(db.engines, 'replica_0', engine)
+        db.metadata.create_all(db.engines['replica_0'])
+        with engine.begin() as connection:
+            connection.execute(Venue.__table__.insert(), {'id': 1, 'name': 'Replica Hall', 'city': 'Austin', 'state': 'TX'})
+        db.session.add(Venue(id=1, name='Primary Hall', city='Austin', state='TX'))
+        db.session.commit()
+    monkeypatch.setattr('app.REPLICA_BINDS', ['replica_0'])
+    yield engine
+    engine.dispose()
+
+
+def names(client, path='/venues'):
+    areas = client.get(path, query_string={'format': 'json'}).get_json()['areas']
+    return sorted(venue['name'] for area in areas for venue in area['venues'])
+
+
+def test_listings_read_the_replica(replica, client):
+    assert names(client) == ['Replica Hall']
+    assert b'Replica Hall' in client.get('/venues/1').data
+
+
+def test_writes_go_to_the_primary(app, replica, client):
+    response = client.post('/api/v1/venues', data=json.dumps([VENUE]), content_type='application/json')
+    assert response.status_code == 200, response.get_json()
+    with replica.connect() as connection:
+        assert connection.execute(Venue.__table__.select()).all()[0].name == 'Replica Hall'
+    with app.app_context():
+        assert sorted(name for name, in db.session.query(Venue.name)) == ['Primary Hall', 'The New Room']
+
+
+def test_writer_reads_its_writes_from_the_primary(app, replica, client):
+    writer = client
+    reader = app.test_client()
+    assert names(writer) == ['Replica Hall']
+    response = writer.post('/api/v1/venues', data=json.dumps([VENUE]), content_type='application/json')
+    assert response.status_code == 200, response.get_json()
+    assert names(writer) == ['Primary Hall', 'The New Room']
+    assert names(reader) == ['Replica Hall']
+
+
+def test_writer_returns_to_the_replica_after_the_lag(app, replica, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPLICA_LAG_SECONDS', 0)
+    client.post('/api/v1/venues', data=json.dumps([VENUE]), content_type='application/json')
+    assert names(client) == ['Replica Hall']
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from app import db, Artist, Venue, search_backend
+from search import Autocomplete, MemorySearch, TrigramIndex
+
+
+def test_short_terms_match_substrings():
+    index = TrigramIndex([(1, 'The Blue Note'), (2, 'Bluebird Cafe'), (3, 'Club Blu'), (4, 'Abba')])
+    assert index.search('bl', 10) == (3, [1, 2, 3])
+    assert index.search('B', 10, offset=1) == (4, [2, 3, 4])
+    assert index.search('ub', 10) == (1, [3])
+    assert index.search('%', 10) == (0, [])
+    assert index.search('', 10) == (4, [1, 2, 3, 4])
+
+
+SAMPLE_ARTISTS = ['Guns N Petals', 'Matt Quevado', 'The Wild Sax Band', 'Bjork']
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('A', ['Guns N Petals', 'Matt Quevado', 'The Wild Sax Band']),
+    ('band', ['The Wild Sax Band']),
+    ('jo', ['Bjork']),
+    ('', SAMPLE_ARTISTS),
+])
+def test_artist_search_matches_substrings(app, client, term, expected):
+    # Runs on whichever backend the test database selects: the in-memory
+    # index on SQLite, pg_trgm on PostgreSQL (TEST_DATABASE_URL).
+    with app.app_context():
+        for name in SAMPLE_ARTISTS:
+            db.session.add(Artist(name=name, city='Austin', state='TX'))
+        db.session.commit()
+    app.extensions.pop('search', None)
+    with app.test_request_context():
+        total, rows = search_backend().search(Artist, term, 10)
+    assert total == len(expected)
+    assert sorted(row.name for row in rows) == sorted(expected)
+    page = client.post('/artists/search', data={'search_term': term})
+    for name in expected:
+        assert name.encode() in page.data
+
+
+def test_index_survives_concurrent_writes():
+    index = TrigramIndex((id, 'Venue {0}'.format(id)) for id in range(1000))
+    failures = []
+    done = threading.Event()
+
+    def write():
+        try:
+            while not done.is_set():
+                for id in range(1000, 1500):
+                    index.add(id, 'Venue {0}'.format(id))
+                for id in range(1000, 1500):
+                    index.remove(id)
+        except Exception as e:
+            failures.append(e)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(50):
+            index.search('ve', 10)
+            index.search('venue 1', 10)
+    finally:
+        done.set()
+        writer.join()
+    assert failures == []
+
+
+def add_venue(app, name):
+    with app.app_context():
+        venue = Venue(name=name, city='Austin', state='TX')
+        db.session.add(venue)
+        db.session.commit()
+        return venue.id
+
+
+def test_memory_search_rebuilds_in_background(app, client):
+    add_venue(app, 'Blue Note')
+    backend = MemorySearch(max_age=0.05)
+    with app.test_request_context():
+        assert backend.search(Venue, 'blue', 10)[0] == 1
+        # written by another worker: this process isn't told
+        add_venue(app, 'Blue Moon')
+        assert backend.search(Venue, 'blue', 10)[0] == 1
+        time.sleep(0.1)
+        assert backend.search(Venue, 'blue', 10)[0] == 1
+        while Venue in backend.pending:
+            time.sleep(0.01)
+        assert backend.search(Venue, 'blue', 10)[0] == 2
+
+
+def test_writes_during_rebuild_are_kept(app, client):
+    add_venue(app, 'Blue Note')
+    backend = MemorySearch(max_age=300)
+    with app.test_request_context():
+        backend.index(Venue)
+        backend.pending[Venue] = []
+        backend.add(Venue, 99, 'Blue Whale')
+        backend.refresh(app, Venue)
+        assert backend.index(Venue).search('whale', 10) == (1, [99])
+
+
+def test_autocomplete_serves_old_index_while_rebuilding(app, client, monkeypatch):
+    add_venue(app, 'Blue Note')
+    completions = Autocomplete(max_age=0.05)
+    started, release = threading.Event(), threading.Event()
+    load = completions.load
+
+    def slow_load(model):
+        started.set()
+        release.wait(5)
+        return load(model)
+
+    with app.test_request_context():
+        assert [name for id, name in completions.complete(Venue, 'bl', 10)] == ['Blue Note']
+        add_venue(app, 'Blue Moon')
+        monkeypatch.setattr(completions, 'load', slow_load)
+        time.sleep(0.1)
+        # the request noticing the expiry is answered from the old index
+        assert [name for id, name in completions.complete(Venue, 'bl', 10)] == ['Blue Note']
+        assert started.wait(5)
+        completions.add(Venue, 99, 'Blues Bar')
+        release.set()
+        while Venue in completions.pending:
+            time.sleep(0.01)
+        assert [name for id, name in completions.complete(Venue, 'blu', 10)] == ['Blue Moon', 'Blue Note', 'Blues Bar']
+
+
+def test_autocomplete_endpoint(app, client):
+    id = add_venue(app, 'The Blue Note')
+    app.extensions.pop('autocomplete', None)
+    response = client.get('/api/autocomplete', query_string={'q': 'blu', 'type': 'venue'})
+    assert response.get_json() == {'venues': [{'id': id, 'name': 'The Blue Note'}]}
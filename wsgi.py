@@ -0,0 +1,91 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# create_app() prepares the app for serving. Under gunicorn with
+# preload_app it runs once in the master, so the imports, compiled
+# templates, locale data and query caches it leaves behind are shared by
+# every forked worker;
+# warm_worker() then runs in each worker after the fork to give it its own
+# database connections before the first request arrives.
+#----------------------------------------------------------------------------#
+
+import sys
+from datetime import datetime
+
+from app import app, db, format_datetime, endpoint_metrics, Venue, Artist
+
+
+def compile_templates():
+  # get_template() compiles and caches each template in the Jinja
+  # environment, so no request pays for compiling one.
+  for name in app.jinja_env.list_templates(extensions=['html']):
+    app.jinja_env.get_template(name)
+
+
+def open_pool_connections(count):
+  # on the primary and on every replica bind
+  for engine in db.engines.values():
+    connections = [engine.connect() for _ in range(count)]
+    for connection in connections:
+      connection.close()
+
+
+def dispose_engines(close=True):
+  for engine in db.engines.values():
+    engine.dispose(close=close)
+
+
+def load_locale_data():
+  # The first Babel format loads the locale's data files.
+  for format in ('full', 'medium', 'hh:mma'):
+    format_datetime(datetime.now(), format)
+
+
+def warm_requests():
+  # Serving each read page once configures the mappers and fills
+  # SQLAlchemy's statement cache; the warm-up requests are then dropped
+  # from the metrics, and the connections they used closed. A database
+  # that is down at startup only costs the warm-up.
+  client = app.test_client()
+  try:
+    with app.app_context():
+      venue = db.session.query(db.func.min(Venue.id)).scalar()
+      artist = db.session.query(db.func.min(Artist.id)).scalar()
+      db.session.remove()
+    paths = ['/', '/venues', '/artists', '/shows']
+    paths += ['/venues/{0}'.format(venue)] if venue else []
+    paths += ['/artists/{0}'.format(artist)] if artist else []
+    for path in paths:
+      client.get(path)
+    client.post('/venues/search', data={'search_term': 'a'})
+    client.post('/artists/search', data={'search_term': 'a'})
+  except:
+    print(sys.exc_info())
+  finally:
+    endpoint_metrics.reset()
+    with app.app_context():
+      dispose_engines()
+
+
+def create_app():
+  compile_templates()
+  load_locale_data()
+  warm_requests()
+  return app
+
+
+def warm_worker():
+  with app.app_context():
+    # Connections inherited from the master, on the primary or a replica
+    # the warm-up routed reads to, would be shared with the other workers;
+    # drop them without closing the master's sockets.
+    dispose_engines(close=False)
+    try:
+      open_pool_connections(app.config['DB_POOL_SIZE'])
+    except:
+      print(sys.exc_info())
+
+
+application = create_app()